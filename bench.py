@@ -0,0 +1,725 @@
+"""Benchmarks da RB-Tree (rodam sem abrir a interface gráfica).
+
+Uso:
+    python bench.py ops -n 1000000        # sequencial/aleatório/enviesado, 1k..n
+    python bench.py mixed -n 1000000      # proporções leitura/escrita
+    python bench.py memory -n 1000000
+    python bench.py render -n 1000000     # _redraw/_sync_canvas num canvas de gravação
+    python bench.py all -n 100000 --json resultados.json [--compare base.json]
+    python bench.py layout -n 200000
+    python bench.py metrics -n 200000
+    python bench.py bulk -n 1000000
+    python bench.py snapshot -n 500000
+    python bench.py batch -n 300000
+    python bench.py cache -n 500000
+    python bench.py threads -n 200000
+    python bench.py versions -n 200000
+    python bench.py shards -n 1000000     # ShardedCatalogue com 1..nº de núcleos processos
+    python bench.py keys -n 1000000       # chaves str x inteiros do IsbnCodec
+    python bench.py engines -n 1000000    # RedBlackTree x BTree por carga
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from itertools import islice
+
+from btree import BTree
+from concurrent_tree import ConcurrentRedBlackTree
+from isbn import ISBN_CODEC, isbn13_check
+from persistent import PersistentRedBlackTree
+from rbtree import RedBlackTree, _Node
+from sharding import ShardedCatalogue
+
+
+# ===============================
+# Utilidades
+# ===============================
+
+def _keys(n: int, seed: int = 1):
+    keys = [f"{i:013d}" for i in range(n)]
+    random.Random(seed).shuffle(keys)
+    return keys
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def _report(title: str, results: dict):
+    print(f"== {title}")
+    for name, value in results.items():
+        if isinstance(value, float):
+            print(f"  {name:<36} {value:>14,.1f}")
+        else:
+            print(f"  {name:<36} {value!s:>14}")
+    return results
+
+
+# ===============================
+# Layout dos nós
+# ===============================
+
+@dataclass(eq=False)
+class _LegacyNode:
+    """Layout anterior do nó (dataclass com __dict__ e cor em string)."""
+    key: str
+    data: dict
+    color: str = "RED"
+    left: "_LegacyNode" = None
+    right: "_LegacyNode" = None
+    parent: "_LegacyNode" = None
+
+
+def _bytes_per_node(factory, keys) -> float:
+    tracemalloc.start()
+    nodes = [factory(k) for k in keys]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    # desconta a lista que segura os nós (8 bytes por ponteiro)
+    return (current - 8 * len(keys)) / len(keys)
+
+
+def bench_layout(n: int):
+    """Memória por nó (layout anterior x atual) e vazão da árvore atual."""
+    keys = _keys(n)
+    res = {
+        "bytes/nó (dataclass)": _bytes_per_node(lambda k: _LegacyNode(k, None), keys),
+        "bytes/nó (__slots__)": _bytes_per_node(lambda k: _Node(k, None), keys),
+    }
+
+    tree = RedBlackTree()
+    t0 = time.perf_counter()
+    for k in keys:
+        tree.insert(k, None)
+    res["insert ops/s"] = _rate(n, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for k in keys:
+        tree.search(k)
+    res["search ops/s"] = _rate(n, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for k in keys:
+        tree.delete(k)
+    res["delete ops/s"] = _rate(n, time.perf_counter() - t0)
+    return _report(f"layout (n={n:,})", res)
+
+
+def bench_bulk(n: int):
+    """Carga de n livros: insert um a um x from_sorted x bulk_load (mescla)."""
+    items = sorted((k, None) for k in _keys(n))
+    res = {}
+
+    tree = RedBlackTree()
+    t0 = time.perf_counter()
+    for k, d in items:
+        tree.insert(k, d)
+    res["insert em laço (s)"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    RedBlackTree.from_sorted(items)
+    res["from_sorted (s)"] = time.perf_counter() - t0
+
+    tree = RedBlackTree.from_sorted(items[::2])
+    t0 = time.perf_counter()
+    tree.bulk_load(items[1::2])
+    res["bulk_load 50%+50% (s)"] = time.perf_counter() - t0
+    return _report(f"carga em lote (n={n:,})", res)
+
+
+def _books(n: int):
+    """n livros sintéticos, já ordenados por ISBN."""
+    return [(f"{i:013d}", {"isbn": f"{i:013d}", "titulo": f"Título {i}", "autor": "Autor", "ano": 1900 + i % 120})
+            for i in range(n)]
+
+
+def bench_snapshot(n: int):
+    """save/load do snapshot binário x reinserir cada registro."""
+    items = _books(n)
+    tree = RedBlackTree.from_sorted(items)
+    res = {}
+
+    t0 = time.perf_counter()
+    rebuilt = RedBlackTree()
+    for k, d in items:
+        rebuilt.insert(k, d)
+    res["insert em laço (s)"] = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for compress in (False, True):
+            label = "zlib" if compress else "cru"
+            path = os.path.join(tmp, f"acervo-{label}.rbs")
+            t0 = time.perf_counter()
+            tree.save(path, compress=compress)
+            res[f"save {label} (s)"] = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            RedBlackTree.load(path)
+            res[f"load {label} (s)"] = time.perf_counter() - t0
+            res[f"bytes/registro {label}"] = os.path.getsize(path) / n
+    return _report(f"snapshot (n={n:,})", res)
+
+
+def _best_of(fn, setup, repeat=5):
+    """Menor tempo de ``fn(setup())`` em ``repeat`` rodadas (setup fora do tempo)."""
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup()
+        gc.collect()  # não cobra de fn a coleta dos objetos criados no setup
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_batch(n: int):
+    """search/insert/delete_many x laço com os métodos de uma chave."""
+    base = [(f"{i:013d}", None) for i in range(0, 2 * n, 2)]
+    rng = random.Random(7)
+    res = {}
+    for m in (1_000, 10_000, 100_000):
+        if m > n:
+            break
+        keys = [f"{rng.randrange(2 * n):013d}" for _ in range(m)]
+        items = [(k, None) for k in keys]
+        tree = RedBlackTree.from_sorted(base)
+        fresh = lambda: RedBlackTree.from_sorted(base)
+        same = lambda: tree
+        cases = {
+            "search": (lambda t: [t.search(k) for k in keys], lambda t: t.search_many(keys), same),
+            "insert": (lambda t: [t.insert(k, d) for k, d in items], lambda t: t.insert_many(items), fresh),
+            "delete": (lambda t: [t.delete(k) for k in keys], lambda t: t.delete_many(keys), fresh),
+        }
+        for op, (loop, many, setup) in cases.items():
+            t_loop, t_many = _best_of(loop, setup), _best_of(many, setup)
+            res[f"{op} m={m:,} laço (ms)"] = t_loop * 1e3
+            res[f"{op} m={m:,} _many (ms)"] = t_many * 1e3
+    return _report(f"lotes (árvore com n={n:,})", res)
+
+
+def _zipf_keys(keys, count: int, s: float = 1.1, seed: int = 3):
+    """``count`` consultas concentradas em poucas chaves populares (Zipf)."""
+    weights = [1 / (rank + 1) ** s for rank in range(len(keys))]
+    return random.Random(seed).choices(keys, weights=weights, k=count)
+
+
+def bench_cache(n: int):
+    """search com e sem cache LRU sob consultas enviesadas (Zipf)."""
+    items = [(k, None) for k in sorted(_keys(n))]
+    lookups = _zipf_keys([k for k, _ in items], 200_000)
+    res = {}
+    for size in (0, 1_000, 10_000):
+        tree = RedBlackTree.from_sorted(items, cache_size=size)
+        t0 = time.perf_counter()
+        for k in lookups:
+            tree.search(k)
+        res[f"cache={size:,} ops/s"] = _rate(len(lookups), time.perf_counter() - t0)
+        if size:
+            info = tree.cache_info()
+            res[f"cache={size:,} acertos (%)"] = 100.0 * info["hits"] / (info["hits"] + info["misses"])
+    return _report(f"cache LRU (n={n:,}, 200k consultas Zipf)", res)
+
+
+def _run_threads(tree, keys, readers: int, seconds: float):
+    """``readers`` threads consultando e uma inserindo por ``seconds`` segundos."""
+    stop = threading.Event()
+    counts = [0] * (readers + 1)
+
+    def reader(slot):
+        rng = random.Random(slot)
+        done = 0
+        while not stop.is_set():
+            for k in rng.choices(keys, k=256):
+                tree.search(k)
+            done += 256
+        counts[slot] = done
+
+    def writer():
+        i = done = 0
+        while not stop.is_set():
+            tree.insert(f"w{i:012d}", None)
+            i += 1
+            done += 1
+        counts[readers] = done
+
+    threads = [threading.Thread(target=reader, args=(s,)) for s in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts[:readers]) / seconds, counts[readers] / seconds
+
+
+def bench_threads(n: int, seconds: float = 2.0):
+    """Vazão de leitura/escrita com ConcurrentRedBlackTree e 1..8 leitores."""
+    items = [(k, None) for k in sorted(_keys(n))]
+    keys = [k for k, _ in items]
+    res = {}
+    tree = RedBlackTree.from_sorted(items)
+    t0 = time.perf_counter()
+    for k in keys[:200_000]:
+        tree.search(k)
+    res["sem lock, 1 thread ops/s"] = _rate(min(n, 200_000), time.perf_counter() - t0)
+    for readers in (1, 2, 4, 8):
+        tree = ConcurrentRedBlackTree(RedBlackTree.from_sorted(items))
+        reads, writes = _run_threads(tree, keys, readers, seconds)
+        res[f"{readers} leitor(es) search/s"] = reads
+        res[f"{readers} leitor(es) insert/s"] = writes
+    return _report(f"concorrência (n={n:,}, {seconds:g}s por rodada)", res)
+
+
+def bench_versions(n: int, versions: int = 1_000):
+    """Guardar versões: deepcopy da RedBlackTree x PersistentRedBlackTree."""
+    items = _books(n)
+    rng = random.Random(5)
+    updates = [(f"{rng.randrange(n):013d}", {"rev": i}) for i in range(versions)]
+    res = {}
+
+    tree = RedBlackTree.from_sorted(items)
+    t0 = time.perf_counter()
+    copy.deepcopy(tree)
+    res["deepcopy por versão (ms)"] = (time.perf_counter() - t0) * 1e3
+
+    current = PersistentRedBlackTree.from_sorted(items)
+    history = []
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for k, d in updates:
+        history.append(current)
+        current = current.insert(k, d)
+    elapsed = time.perf_counter() - t0
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    res["persistente por versão (ms)"] = elapsed / versions * 1e3
+    res["persistente bytes/versão"] = used / versions
+    return _report(f"versões (n={n:,}, {versions:,} versões)", res)
+
+
+def _isbn13(i: int) -> str:
+    body = f"978{i:09d}"
+    return body + isbn13_check(body)
+
+
+def bench_keys(n: int, lookups: int = 200_000):
+    """Chaves str x inteiros do IsbnCodec: memória por chave e custo de search."""
+    isbns = [_isbn13(i) for i in range(n)]
+    probes = random.Random(11).choices(isbns, k=lookups)
+    res = {}
+    for label, codec in (("str", None), ("IsbnCodec", ISBN_CODEC)):
+        build = lambda: RedBlackTree.from_sorted(((_isbn13(i), None) for i in range(n)), key_codec=codec)
+        res[f"{label} bytes/chave (árvore)"] = _bytes_per_item(build, n)
+        tree = build()
+        t0 = time.perf_counter()
+        for k in probes:
+            tree.search(k)
+        res[f"{label} search(texto) ns/op"] = (time.perf_counter() - t0) / lookups * 1e9
+        if codec is not None:
+            # chaves já codificadas (ex.: vindas de iter_items): só comparações de int
+            encoded = [codec.encode(k) for k in probes]
+            t0 = time.perf_counter()
+            for k in encoded:
+                tree.search(k)
+            res[f"{label} search(int) ns/op"] = (time.perf_counter() - t0) / lookups * 1e9
+            t0 = time.perf_counter()
+            tree.search_many(probes)
+            res[f"{label} search_many(texto) ns/op"] = (time.perf_counter() - t0) / lookups * 1e9
+        else:
+            t0 = time.perf_counter()
+            tree.search_many(probes)
+            res[f"{label} search_many ns/op"] = (time.perf_counter() - t0) / lookups * 1e9
+    return _report(f"chaves (n={n:,}, {lookups:,} buscas)", res)
+
+
+def bench_shards(n: int, batch: int = 10_000, rounds: int = 20):
+    """Vazão de search_many/insert_many em lotes: 1 processo x N shards.
+
+    Só escala com núcleos livres: com 1 CPU as shards se revezam nele.
+    """
+    items = _books(n)
+    rng = random.Random(9)
+    lookups = [[k for k, _ in rng.choices(items, k=batch)] for _ in range(rounds)]
+    writes = [[(f"{rng.randrange(n):013d}", {"rev": r}) for _ in range(batch)] for r in range(rounds)]
+    res = {}
+
+    tree = RedBlackTree.from_sorted(items)
+    t0 = time.perf_counter()
+    for keys in lookups:
+        tree.search_many(keys)
+    res["1 processo search/s"] = _rate(batch * rounds, time.perf_counter() - t0)
+
+    cpus = os.cpu_count() or 1
+    for workers in sorted({1, 2, 4, cpus}):
+        with ShardedCatalogue.from_sorted(items, workers, rebalance_every=0) as catalogue:
+            t0 = time.perf_counter()
+            for keys in lookups:
+                catalogue.search_many(keys)
+            res[f"{workers} shard(s) search/s"] = _rate(batch * rounds, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for chunk in writes:
+                catalogue.insert_many(chunk)
+            res[f"{workers} shard(s) insert/s"] = _rate(batch * rounds, time.perf_counter() - t0)
+    return _report(f"shards (n={n:,}, lotes de {batch:,}, {cpus} CPU(s))", res)
+
+
+def bench_metrics(n: int):
+    """Custo das métricas: insert/search/delete com metrics desligado x ligado."""
+    keys = _keys(n)
+    res = {}
+    for enabled in (False, True):
+        label = "com métricas" if enabled else "sem métricas"
+        tree = RedBlackTree(metrics=enabled)
+        for op in ("insert", "search", "delete"):
+            fn = getattr(tree, op)
+            args = [(k, None) for k in keys] if op == "insert" else [(k,) for k in keys]
+            t0 = time.perf_counter()
+            for a in args:
+                fn(*a)
+            res[f"{op} {label} ops/s"] = _rate(n, time.perf_counter() - t0)
+    return _report(f"métricas (n={n:,})", res)
+
+
+# ===============================
+# Suíte: cargas, memória e renderização
+# ===============================
+
+def _sizes(n: int):
+    """1k, 10k, 100k... até n (inclusive)."""
+    sizes, size = [], 1_000
+    while size < n:
+        sizes.append(size)
+        size *= 10
+    sizes.append(n)
+    return sizes
+
+
+def _workload(kind: str, n: int):
+    """(ordem de inserção, ordem de consulta/remoção) para ``kind``:
+
+    - sequential: chaves crescentes (ISBNs cadastrados em sequência);
+    - random: ordem aleatória;
+    - skewed: 16 sequências crescentes intercaladas (várias editoras
+      cadastrando ao mesmo tempo) e consultas concentradas (Zipf).
+    """
+    keys = [f"{i:013d}" for i in range(n)]
+    if kind == "sequential":
+        return keys, keys
+    if kind == "random":
+        shuffled = _keys(n)
+        return shuffled, shuffled
+    runs = 16
+    inserts = [keys[r * n // runs + i] for i in range(n // runs + 1) for r in range(runs)
+               if r * n // runs + i < (r + 1) * n // runs]
+    return inserts, _zipf_keys(keys, n)
+
+
+def bench_ops(n: int):
+    """insert/search/inorder/delete por tipo de carga e tamanho (1k..n)."""
+    res = {}
+    for size in _sizes(n):
+        for kind in ("sequential", "random", "skewed"):
+            inserts, lookups = _workload(kind, size)
+            tree = RedBlackTree()
+            insert, search, delete = tree.insert, tree.search, tree.delete
+            t0 = time.perf_counter()
+            for k in inserts:
+                insert(k, None)
+            res[f"{kind} n={size:,} insert ops/s"] = _rate(size, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for k in lookups:
+                search(k)
+            res[f"{kind} n={size:,} search ops/s"] = _rate(len(lookups), time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            tree.inorder()
+            res[f"{kind} n={size:,} inorder itens/s"] = _rate(size, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for k in inserts:
+                delete(k)
+            res[f"{kind} n={size:,} delete ops/s"] = _rate(size, time.perf_counter() - t0)
+    return _report(f"operações por carga (até n={n:,})", res)
+
+
+def bench_mixed(n: int, ops: int = 200_000):
+    """Vazão com proporções de leitura/escrita de 95/5, 50/50 e 5/95."""
+    base = [(f"{i:013d}", None) for i in range(0, 2 * n, 2)]
+    res = {}
+    for reads in (0.95, 0.50, 0.05):
+        rng = random.Random(11)
+        plan = [(rng.random() < reads, f"{rng.randrange(2 * n):013d}") for _ in range(ops)]
+        tree = RedBlackTree.from_sorted(base)
+        search, insert, delete = tree.search, tree.insert, tree.delete
+        t0 = time.perf_counter()
+        for i, (is_read, k) in enumerate(plan):
+            if is_read:
+                search(k)
+            elif i & 1:
+                insert(k, None)
+            else:
+                delete(k)
+        res[f"leitura {reads:.0%} ops/s"] = _rate(ops, time.perf_counter() - t0)
+    return _report(f"leitura/escrita (n={n:,}, {ops:,} operações)", res)
+
+
+def bench_engines(n: int, ops: int = 200_000, scan: int = 1_000):
+    """RedBlackTree x BTree (CatalogueEngine) nas cargas do catálogo."""
+    items = [(f"{i:013d}", None) for i in range(0, 2 * n, 2)]
+    rng = random.Random(13)
+    lookups = [f"{rng.randrange(2 * n):013d}" for _ in range(ops)]
+    starts = [f"{rng.randrange(2 * n):013d}" for _ in range(max(1, ops // scan))]
+    positions = [rng.randrange(n) for _ in range(ops)]
+    res = {}
+    for label, engine in (("rbtree", RedBlackTree), ("btree", BTree)):
+        res[f"{label} bytes/item"] = _bytes_per_item(lambda: engine.from_sorted(items, order_stats=True), n)
+        t0 = time.perf_counter()
+        tree = engine.from_sorted(items, order_stats=True)
+        res[f"{label} from_sorted (s)"] = time.perf_counter() - t0
+        search = tree.search
+        t0 = time.perf_counter()
+        for k in lookups:
+            search(k)
+        res[f"{label} search ops/s"] = _rate(ops, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        for lo in starts:
+            for _ in islice(tree.iter_from(lo), scan):
+                pass
+        res[f"{label} faixa de {scan:,} itens/s"] = _rate(len(starts) * scan, time.perf_counter() - t0)
+        select = tree.select
+        t0 = time.perf_counter()
+        for i in positions:
+            select(i)
+        res[f"{label} select ops/s"] = _rate(ops, time.perf_counter() - t0)
+        for reads in (0.95, 0.05):
+            plan = [(rng.random() < reads, k) for k in lookups]
+            tree = engine.from_sorted(items, order_stats=True)
+            search, insert, delete = tree.search, tree.insert, tree.delete
+            t0 = time.perf_counter()
+            for i, (is_read, k) in enumerate(plan):
+                if is_read:
+                    search(k)
+                elif i & 1:
+                    insert(k, None)
+                else:
+                    delete(k)
+            res[f"{label} leitura {reads:.0%} ops/s"] = _rate(ops, time.perf_counter() - t0)
+        shuffled = _keys(min(n, ops))
+        tree = engine(order_stats=True)
+        insert = tree.insert
+        t0 = time.perf_counter()
+        for k in shuffled:
+            insert(k, None)
+        res[f"{label} insert aleatório ops/s"] = _rate(len(shuffled), time.perf_counter() - t0)
+    return _report(f"motores (n={n:,}, {ops:,} operações)", res)
+
+
+def _bytes_per_item(build, n: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()  # temporários presos em ciclos (closures recursivas do build)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return used / n
+
+
+def bench_memory(n: int):
+    """Bytes por nó da árvore inteira (sem contar chaves e dados)."""
+    items = [(k, None) for k in sorted(_keys(n))]
+    res = {
+        "RedBlackTree bytes/nó": _bytes_per_item(lambda: RedBlackTree.from_sorted(items), n),
+        "order_stats bytes/nó": _bytes_per_item(lambda: RedBlackTree.from_sorted(items, order_stats=True), n),
+        "Persistent bytes/nó": _bytes_per_item(lambda: PersistentRedBlackTree.from_sorted(items), n),
+    }
+    return _report(f"memória (n={n:,})", res)
+
+
+class _RecordingCanvas:
+    """Canvas falso com a parte da API usada pelo App: só conta e guarda itens.
+
+    Mede o custo do lado Python (layout, culling, LOD), sem Tk nem display.
+    """
+
+    def __init__(self, width=1000, height=600):
+        self.items = {}
+        self.tags = {}
+        self.created = 0
+        self._next = 0
+        self._width, self._height = width, height
+        self._view = [0.0, 0.0]
+        self._region = (0, 0, 1, 1)
+
+    def _create(self, kind, coords, kw):
+        self._next += 1
+        self.created += 1
+        tags = kw.get("tags", ())
+        tags = (tags,) if isinstance(tags, str) else tuple(tags)
+        self.items[self._next] = (kind, coords, tags)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(self._next)
+        return self._next
+
+    def create_line(self, *coords, **kw):
+        return self._create("line", coords, kw)
+
+    def create_oval(self, *coords, **kw):
+        return self._create("oval", coords, kw)
+
+    def create_text(self, *coords, **kw):
+        return self._create("text", coords, kw)
+
+    def create_rectangle(self, *coords, **kw):
+        return self._create("rectangle", coords, kw)
+
+    def _ids(self, tag):
+        if tag == "all":
+            return list(self.items)
+        if isinstance(tag, int):
+            return [tag] if tag in self.items else []
+        return list(self.tags.get(tag, ()))
+
+    def delete(self, *tags):
+        for tag in tags:
+            for i in self._ids(tag):
+                for t in self.items.pop(i)[2]:
+                    self.tags[t].discard(i)
+
+    def find_withtag(self, tag):
+        return tuple(self._ids(tag))
+
+    def tag_lower(self, *args):
+        pass
+
+    tag_raise = itemconfigure = tag_lower
+
+    def canvasx(self, x):
+        return self._view[0] + x
+
+    def canvasy(self, y):
+        return self._view[1] + y
+
+    def winfo_width(self):
+        return self._width
+
+    def winfo_height(self):
+        return self._height
+
+    def config(self, scrollregion):
+        self._region = tuple(scrollregion)
+
+    def cget(self, option):
+        return " ".join(str(v) for v in self._region)
+
+    def xview_moveto(self, fraction):
+        x0, _, x1, _ = self._region
+        self._view[0] = x0 + fraction * (x1 - x0)
+
+    def yview_moveto(self, fraction):
+        _, y0, _, y1 = self._region
+        self._view[1] = y0 + fraction * (y1 - y0)
+
+
+class _NoTk:
+    def after_idle(self, callback):
+        pass
+
+
+def _headless_app(tree):
+    """App só com o que o desenho da árvore usa (sem janela)."""
+    from main import App  # só este benchmark precisa do Tkinter
+    app = App.__new__(App)
+    app.root, app.tree, app.canvas = _NoTk(), tree, _RecordingCanvas()
+    app._scale, app._coords, app._height = 1.0, None, 0
+    app._drawn, app._sync_pending = {}, False
+    app._canvas_visible = lambda: True
+    return app
+
+
+def bench_render(n: int):
+    """Layout e desenho da árvore (redesenho, pan e edição) sem display."""
+    res = {}
+    for size in _sizes(n):
+        tree = RedBlackTree.from_sorted(((k, None) for k in sorted(_keys(size))), order_stats=True)
+        app = _headless_app(tree)
+        t0 = time.perf_counter()
+        app._redraw()
+        res[f"n={size:,} _redraw (ms)"] = (time.perf_counter() - t0) * 1e3
+        res[f"n={size:,} itens no canvas"] = len(app.canvas.items)
+        app.canvas.xview_moveto(0.25)
+        t0 = time.perf_counter()
+        app._sync_canvas()
+        res[f"n={size:,} pan (ms)"] = (time.perf_counter() - t0) * 1e3
+        tree.insert("0000000000000x", None)
+        t0 = time.perf_counter()
+        app._tree_changed()
+        res[f"n={size:,} insert+redesenho (ms)"] = (time.perf_counter() - t0) * 1e3
+    return _report(f"renderização (até n={n:,})", res)
+
+
+BENCHMARKS = {
+    "batch": bench_batch,
+    "cache": bench_cache,
+    "keys": bench_keys,
+    "bulk": bench_bulk,
+    "engines": bench_engines,
+    "layout": bench_layout,
+    "memory": bench_memory,
+    "metrics": bench_metrics,
+    "mixed": bench_mixed,
+    "ops": bench_ops,
+    "render": bench_render,
+    "shards": bench_shards,
+    "snapshot": bench_snapshot,
+    "threads": bench_threads,
+    "versions": bench_versions,
+}
+
+
+def _compare(baseline: dict, current: dict):
+    """Variação percentual de cada métrica presente nos dois resultados."""
+    print("== comparação com a base")
+    for bench, res in current.items():
+        old = baseline.get(bench, {})
+        for name, value in res.items():
+            before = old.get(name)
+            if isinstance(before, (int, float)) and before:
+                print(f"  {bench:<9} {name:<40} {before:>14,.1f} -> {value:>14,.1f} ({(value - before) / before:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks da RB-Tree")
+    parser.add_argument("bench", choices=sorted(BENCHMARKS) + ["all"], help="benchmark a executar")
+    parser.add_argument("-n", type=int, default=100_000, help="quantidade de chaves")
+    parser.add_argument("--json", help="grava os resultados neste arquivo (JSON)")
+    parser.add_argument("--compare", help="resultado JSON anterior para comparar")
+    args = parser.parse_args(argv)
+    names = sorted(BENCHMARKS) if args.bench == "all" else [args.bench]
+    results = {name: BENCHMARKS[name](args.n) for name in names}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            _compare(json.load(f)["results"], results)
+    if args.json:
+        meta = {
+            "n": args.n,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
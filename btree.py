@@ -0,0 +1,489 @@
+"""B+-tree em memória com a mesma API de catálogo da RedBlackTree.
+
+Na RedBlackTree cada busca desce ~log2(n) nós, e cada nó é um objeto
+Python à parte (ponteiros, cor, tamanho). Aqui um nó guarda até ``order``
+chaves em listas e a busca dentro dele é um bisect (em C): com o padrão de
+64, um milhão de chaves fica a 4 níveis, com bem menos saltos interpretados
+por consulta e bem menos objetos por chave.
+
+- folhas: ``keys``/``values`` em listas paralelas, encadeadas (``prev``/
+  ``next``) para travessias e faixas;
+- nós internos: ``keys`` (separadores: keys[i] <= toda chave de
+  children[i + 1] e > toda chave de children[i]), ``children`` e
+  ``counts`` (itens sob cada filho), que dão rank/select/count_range em
+  O(log n).
+
+Todo nó, menos a raiz, tem ao menos order // 2 entradas: um nó abaixo disso
+redistribui entradas com um irmão ou se funde a ele.
+
+Não há cor: os iteradores geram "—" no lugar dela, e ``search``/``select``
+devolvem um item com ``key``, ``data`` e ``color``.
+"""
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from rbtree import CatalogueEngine, InvariantError, RedBlackTree, _SecondaryIndex, _gc_paused
+
+_NO_COLOR = "—"
+
+
+class _Leaf:
+    __slots__ = ("keys", "values", "prev", "next")
+
+    def __init__(self, keys, values):
+        self.keys = keys
+        self.values = values
+        self.prev = self.next = None
+
+
+class _Inner:
+    __slots__ = ("keys", "children", "counts")
+
+    def __init__(self, keys, children, counts):
+        self.keys = keys
+        self.children = children
+        self.counts = counts
+
+
+class _Item:
+    """Chave e dados devolvidos por ``search``/``select`` (e guardados nos índices)."""
+    __slots__ = ("key", "data")
+    color = _NO_COLOR
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+
+    def __repr__(self):
+        return f"_Item(key={self.key!r})"
+
+
+def _size(node) -> int:
+    return len(node.keys) if node.__class__ is _Leaf else sum(node.counts)
+
+
+class BTree(CatalogueEngine):
+    def __init__(self, order: int = 64, key_codec=None, order_stats: bool = True):
+        """``order``: máximo de entradas por nó. ``key_codec`` como na
+        RedBlackTree. ``order_stats`` existe só pela compatibilidade de
+        construtor: as contagens por filho são sempre mantidas."""
+        if order < 4:
+            raise ValueError("order precisa ser >= 4")
+        self._max = order
+        self._min = order // 2
+        self.root = _Leaf([], [])
+        self._count = 0
+        self.key_codec = key_codec
+        self._key = str if key_codec is None else key_codec.encode
+        self._indexes = {}  # nome -> _SecondaryIndex (ver add_index)
+
+    def __len__(self):
+        return self._count
+
+    def _descend(self, key):
+        """Folha onde ``key`` está ou entraria, e o caminho [(nó interno, filho)]."""
+        path = []
+        node = self.root
+        while node.__class__ is _Inner:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        return node, path
+
+    # ---------- Construção ----------
+    @classmethod
+    def from_sorted(cls, items, **kwargs):
+        """B+-tree em O(n) a partir de pares (chave, dados) (ordena se preciso)."""
+        tree = cls(**kwargs)
+        with _gc_paused():
+            tree._build(RedBlackTree._sorted_unique(items, tree._key))
+        return tree
+
+    def _groups(self, n: int):
+        """Fronteiras de ceil(n / order) grupos de tamanhos iguais (±1)."""
+        g = -(-n // self._max)
+        return [n * i // g for i in range(g + 1)]
+
+    def _build(self, pairs):
+        """Liga ``pairs`` (ordenados, sem repetição) em folhas cheias e, por
+        cima, níveis internos até sobrar uma raiz."""
+        self._count = len(pairs)
+        if not pairs:
+            self.root = _Leaf([], [])
+            return
+        keys = [k for k, _ in pairs]
+        values = [d for _, d in pairs]
+        cuts = self._groups(len(pairs))
+        level, prev = [], None  # (nó, menor chave, tamanho)
+        for lo, hi in zip(cuts, cuts[1:]):
+            leaf = _Leaf(keys[lo:hi], values[lo:hi])
+            leaf.prev = prev
+            if prev is not None:
+                prev.next = leaf
+            prev = leaf
+            level.append((leaf, keys[lo], hi - lo))
+        while len(level) > 1:
+            cuts = self._groups(len(level))
+            level = [
+                (_Inner([k for _, k, _ in group[1:]], [n for n, _, _ in group], [c for _, _, c in group]),
+                 group[0][1], sum(c for _, _, c in group))
+                for group in (level[lo:hi] for lo, hi in zip(cuts, cuts[1:]))
+            ]
+        self.root = level[0][0]
+
+    def bulk_load(self, items):
+        """Mescla um lote de pares (chave, dados). Lotes pequenos usam
+        ``insert``; os grandes são intercalados com os itens atuais e a
+        árvore é reconstruída em O(n + m)."""
+        with _gc_paused():
+            batch = RedBlackTree._sorted_unique(items, self._key)
+            if not batch:
+                return
+            if len(batch) * 8 < self._count:
+                for k, d in batch:
+                    self.insert(k, d)
+                return
+            merged, i = [], 0
+            for k, d, _ in self.iter_items():
+                while i < len(batch) and batch[i][0] < k:
+                    merged.append(batch[i])
+                    i += 1
+                if i < len(batch) and batch[i][0] == k:
+                    merged.append(batch[i])  # o lote vence
+                    i += 1
+                else:
+                    merged.append((k, d))
+            merged.extend(batch[i:])
+            self._build(merged)
+            for index in self._indexes.values():
+                self._fill_index(index)
+
+    # ---------- Inserção ----------
+    def insert(self, key, data) -> bool:
+        """Insere ou atualiza. Retorna True se a chave é nova, False se só atualizou."""
+        key = self._key(key)
+        leaf, path = self._descend(key)
+        keys = leaf.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if self._indexes:
+                self._index_remove(key, leaf.values[i])
+                self._index_add(key, data)
+            leaf.values[i] = data
+            return False
+        keys.insert(i, key)
+        leaf.values.insert(i, data)
+        self._count += 1
+        for inner, j in path:
+            inner.counts[j] += 1
+        if len(keys) > self._max:
+            self._split(leaf, path)
+        if self._indexes:
+            self._index_add(key, data)
+        return True
+
+    def _split(self, node, path):
+        """Divide ``node`` (cheio demais) ao meio; o separador sobe para o
+        pai, que por sua vez pode precisar ser dividido."""
+        while True:
+            if node.__class__ is _Leaf:
+                mid = len(node.keys) // 2
+                right = _Leaf(node.keys[mid:], node.values[mid:])
+                del node.keys[mid:], node.values[mid:]
+                right.prev, right.next = node, node.next
+                if node.next is not None:
+                    node.next.prev = right
+                node.next = right
+                sep, moved = right.keys[0], len(right.keys)
+            else:
+                mid = len(node.keys) // 2
+                sep = node.keys[mid]
+                right = _Inner(node.keys[mid + 1:], node.children[mid + 1:], node.counts[mid + 1:])
+                del node.keys[mid:], node.children[mid + 1:], node.counts[mid + 1:]
+                moved = sum(right.counts)
+            if not path:
+                self.root = _Inner([sep], [node, right], [_size(node), moved])
+                return
+            parent, j = path.pop()
+            parent.keys.insert(j, sep)
+            parent.children.insert(j + 1, right)
+            parent.counts[j] -= moved
+            parent.counts.insert(j + 1, moved)
+            if len(parent.children) <= self._max:
+                return
+            node = parent
+
+    # ---------- Remoção ----------
+    def delete(self, key) -> bool:
+        """Remove a chave. Retorna True se removeu, False se não existia."""
+        key = self._key(key)
+        leaf, path = self._descend(key)
+        keys = leaf.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return False
+        del keys[i]
+        data = leaf.values.pop(i)
+        self._count -= 1
+        for inner, j in path:
+            inner.counts[j] -= 1
+        if len(keys) < self._min and path:
+            self._fix_underflow(path)
+        if self._indexes:
+            self._index_remove(key, data)
+        return True
+
+    def _fix_underflow(self, path):
+        """O filho indicado no fim de ``path`` ficou abaixo do mínimo: junta-o
+        a um irmão e, se não couber num nó, redistribui meio a meio."""
+        while path:
+            parent, j = path.pop()
+            li = j - 1 if j > 0 else j  # par (li, li + 1) com o irmão
+            left, right = parent.children[li], parent.children[li + 1]
+            if left.__class__ is _Leaf:
+                keys = left.keys + right.keys
+                values = left.values + right.values
+                if len(keys) > self._max:
+                    mid = len(keys) // 2
+                    left.keys, left.values = keys[:mid], values[:mid]
+                    right.keys, right.values = keys[mid:], values[mid:]
+                    parent.keys[li] = right.keys[0]
+                    parent.counts[li], parent.counts[li + 1] = mid, len(keys) - mid
+                    return
+                left.keys, left.values = keys, values
+                left.next = right.next
+                if right.next is not None:
+                    right.next.prev = left
+            else:
+                keys = left.keys + [parent.keys[li]] + right.keys
+                children = left.children + right.children
+                counts = left.counts + right.counts
+                if len(children) > self._max:
+                    mid = len(keys) // 2
+                    left.keys, left.children, left.counts = keys[:mid], children[:mid + 1], counts[:mid + 1]
+                    parent.keys[li] = keys[mid]
+                    right.keys, right.children, right.counts = keys[mid + 1:], children[mid + 1:], counts[mid + 1:]
+                    parent.counts[li], parent.counts[li + 1] = sum(left.counts), sum(right.counts)
+                    return
+                left.keys, left.children, left.counts = keys, children, counts
+            # fundidos: o irmão da direita sai do pai
+            del parent.keys[li], parent.children[li + 1]
+            parent.counts[li] += parent.counts.pop(li + 1)
+            if not path:
+                if len(parent.children) == 1:
+                    self.root = parent.children[0]
+                return
+            if len(parent.children) >= self._min:
+                return
+
+    # ---------- Lotes ----------
+    def search_many(self, keys):
+        """Busca várias chaves; devolve, na ordem de entrada, o item ou None."""
+        return [self.search(k) for k in keys]
+
+    def insert_many(self, items):
+        """Insere/atualiza pares (chave, dados); devolve, na ordem de entrada,
+        True para cada chave nova (repetidas no lote: só a primeira)."""
+        with _gc_paused():
+            return [self.insert(k, d) for k, d in items]
+
+    def delete_many(self, keys):
+        """Remove várias chaves; devolve, na ordem de entrada, True para cada
+        chave removida (repetidas no lote: só a primeira)."""
+        return [self.delete(k) for k in keys]
+
+    # ---------- Busca/Travessias ----------
+    def search(self, key):
+        key = self._key(key)
+        node = self.root
+        while node.__class__ is _Inner:
+            node = node.children[bisect_right(node.keys, key)]
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return _Item(keys[i], node.values[i])
+        return None
+
+    def iter_items(self, reverse=False):
+        """Gera (chave, dados, cor) em ordem (ou em ordem inversa)."""
+        return self.iter_range(reverse=reverse)
+
+    def iter_from(self, key, reverse=False):
+        """Gera os itens a partir de ``key``: chaves >= key, ou <= key se ``reverse``."""
+        return self.iter_range(None, key, True) if reverse else self.iter_range(key)
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        """Gera os itens com lo <= chave <= hi (None = sem limite), folha a folha."""
+        lo = None if lo is None else self._key(lo)
+        hi = None if hi is None else self._key(hi)
+        if reverse:
+            if hi is None:
+                leaf = self.root
+                while leaf.__class__ is _Inner:
+                    leaf = leaf.children[-1]
+                i = len(leaf.keys) - 1
+            else:
+                leaf, _ = self._descend(hi)
+                i = bisect_right(leaf.keys, hi) - 1
+            while leaf is not None:
+                keys, values = leaf.keys, leaf.values
+                while i >= 0:
+                    k = keys[i]
+                    if lo is not None and k < lo:
+                        return
+                    yield k, values[i], _NO_COLOR
+                    i -= 1
+                leaf = leaf.prev
+                if leaf is not None:
+                    i = len(leaf.keys) - 1
+            return
+        if lo is None:
+            leaf = self.root
+            while leaf.__class__ is _Inner:
+                leaf = leaf.children[0]
+            i = 0
+        else:
+            leaf, _ = self._descend(lo)
+            i = bisect_left(leaf.keys, lo)
+        while leaf is not None:
+            keys, values = leaf.keys, leaf.values
+            for j in range(i, len(keys)):
+                k = keys[j]
+                if hi is not None and k > hi:
+                    return
+                yield k, values[j], _NO_COLOR
+            leaf, i = leaf.next, 0
+
+    # ---------- Estatísticas de ordem ----------
+    def _count_below(self, key, inclusive=False):
+        """Quantidade de chaves < key (ou <= key se ``inclusive``)."""
+        r, node = 0, self.root
+        while node.__class__ is _Inner:
+            i = bisect_right(node.keys, key)
+            r += sum(node.counts[:i])
+            node = node.children[i]
+        return r + (bisect_right if inclusive else bisect_left)(node.keys, key)
+
+    def rank(self, key) -> int:
+        """Posição (0-based) que ``key`` ocupa/ocuparia: nº de chaves menores."""
+        return self._count_below(self._key(key))
+
+    def select(self, i: int) -> _Item:
+        """Item na posição ``i`` (0-based) da ordem; aceita índice negativo."""
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("posição fora da árvore")
+        node = self.root
+        while node.__class__ is _Inner:
+            acc = list(accumulate(node.counts))
+            j = bisect_right(acc, i)
+            if j:
+                i -= acc[j - 1]
+            node = node.children[j]
+        return _Item(node.keys[i], node.values[i])
+
+    def count_range(self, lo=None, hi=None) -> int:
+        """Quantidade de chaves com lo <= chave <= hi (None = sem limite)."""
+        upper = self._count if hi is None else self._count_below(self._key(hi), inclusive=True)
+        lower = 0 if lo is None else self._count_below(self._key(lo))
+        return max(0, upper - lower)
+
+    # ---------- Verificação dos invariantes ----------
+    def validate(self):
+        """Confere a estrutura em O(n); levanta InvariantError no primeiro problema.
+
+        Folhas todas na mesma profundidade, ocupação entre order // 2 e order
+        (menos a raiz), chaves em ordem e dentro dos separadores, ``counts``
+        e ``len`` corretos, encadeamento das folhas e índices secundários.
+        """
+        leaves, depths = [], set()
+        # (nó, menor chave permitida, limite superior exclusivo, profundidade)
+        stack = [(self.root, None, None, 0)]
+        while stack:
+            node, lo, hi, depth = stack.pop()
+            root = node is self.root
+            if node.__class__ is _Leaf:
+                keys = node.keys
+                if not root and not self._min <= len(keys) <= self._max:
+                    raise InvariantError(f"folha com {len(keys)} chaves (limites {self._min}..{self._max})")
+                if len(node.values) != len(keys):
+                    raise InvariantError("folha com keys e values de tamanhos diferentes")
+                for a, b in zip(keys, keys[1:]):
+                    if not a < b:
+                        raise InvariantError(f"chaves fora de ordem: {a!r} antes de {b!r}")
+                if keys and ((lo is not None and keys[0] < lo) or (hi is not None and keys[-1] >= hi)):
+                    raise InvariantError(f"folha [{keys[0]!r}..{keys[-1]!r}] fora dos separadores")
+                leaves.append((lo, node))
+                depths.add(depth)
+                continue
+            n = len(node.children)
+            if len(node.keys) != n - 1 or len(node.counts) != n:
+                raise InvariantError("nó interno com keys/children/counts incoerentes")
+            if n > self._max or n < (2 if root else self._min):
+                raise InvariantError(f"nó interno com {n} filhos")
+            for i, child in enumerate(node.children):
+                # basta comparar com o nível de baixo: ele é conferido na sua vez
+                if node.counts[i] != _size(child):
+                    raise InvariantError(f"counts[{i}] = {node.counts[i]}, esperado {_size(child)}")
+                stack.append((child, node.keys[i - 1] if i else lo,
+                               node.keys[i] if i < n - 1 else hi, depth + 1))
+        if len(depths) != 1:
+            raise InvariantError(f"folhas em profundidades diferentes: {sorted(depths)}")
+        leaves = [leaf for _, leaf in sorted(leaves, key=lambda p: (p[0] is not None, p[0]))]
+        if sum(len(leaf.keys) for leaf in leaves) != self._count:
+            raise InvariantError(f"len() = {self._count}, mas as folhas têm {sum(len(l.keys) for l in leaves)}")
+        for a, b in zip([None] + leaves, leaves + [None]):
+            if (a is not None and a.next is not b) or (b is not None and b.prev is not a):
+                raise InvariantError("encadeamento prev/next das folhas quebrado")
+        for name, index in self._indexes.items():
+            index.tree.validate()
+            expected = sorted(index.entries(_Item(k, d) for k, d, _ in self.iter_items()), key=lambda e: e[0])
+            actual = [(k, item.key, item.data) for k, item, _ in index.tree.iter_items()]
+            if [(k, item.key, item.data) for k, item in expected] != actual:
+                raise InvariantError(f"índice {name!r} divergente")
+
+    # ---------- Índices secundários ----------
+    # Como na RedBlackTree (chave composta "<valor>\0<chave>"), mas cada
+    # índice é outra BTree e o dado guardado é um _Item (chave, dados): os
+    # valores das folhas não são objetos estáveis como os nós da RB-Tree.
+    def add_index(self, name: str, extract, encode=str):
+        """Cria (ou recria) o índice ``name`` (ver RedBlackTree.add_index)."""
+        index = _SecondaryIndex(extract, encode)
+        self._fill_index(index)
+        self._indexes[name] = index
+
+    def _fill_index(self, index):
+        items = (_Item(k, d) for k, d, _ in self.iter_items())
+        index.tree = BTree.from_sorted(index.entries(items), order=self._max)
+
+    def _index_add(self, key, data):
+        item = _Item(key, data)
+        for index in self._indexes.values():
+            composite = index.composite(item)
+            if composite is not None:
+                index.tree.insert(composite, item)
+
+    def _index_remove(self, key, data):
+        item = _Item(key, data)
+        for index in self._indexes.values():
+            composite = index.composite(item)
+            if composite is not None:
+                index.tree.delete(composite)
+
+    def find_prefix(self, name: str, prefix):
+        """Gera (chave, dados, cor) dos itens cujo valor indexado começa com ``prefix``."""
+        index = self._indexes[name]
+        prefix = index.encode(prefix)
+        for composite, item, _ in index.tree.iter_from(prefix):
+            if not composite.startswith(prefix):
+                return
+            yield item.key, item.data, _NO_COLOR
+
+    def find_range(self, name: str, lo=None, hi=None):
+        """Gera (chave, dados, cor) dos itens com lo <= valor indexado <= hi."""
+        index = self._indexes[name]
+        lo = None if lo is None else index.encode(lo)
+        hi = None if hi is None else index.encode(hi) + "\x01"
+        for _, item, _ in index.tree.iter_range(lo, hi):
+            yield item.key, item.data, _NO_COLOR
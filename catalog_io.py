@@ -0,0 +1,187 @@
+"""Importação e exportação do catálogo em CSV ou JSONL, em streaming.
+
+Colunas/campos: ``isbn``, ``titulo``, ``autor``, ``ano`` (validados com
+``validate_book``, como no formulário). O formato sai da extensão
+(``.csv`` ou ``.jsonl``/``.ndjson``).
+
+A importação lê o arquivo em blocos de ``chunk_size`` livros e entrega cada
+bloco a ``RedBlackTree.insert_many``; só um bloco fica em memória além da
+árvore. A exportação percorre a árvore em ordem e grava linha a linha.
+
+Uso:
+    python catalog_io.py import livros.csv --db acervo.db
+    python catalog_io.py import livros.jsonl --snapshot acervo.rbs
+    python catalog_io.py export saida.csv --db acervo.db
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from isbn import ISBN_CODEC
+from rbtree import RedBlackTree, validate_book
+
+FIELDS = ("isbn", "titulo", "autor", "ano")
+_MAX_ERRORS = 100  # erros guardados no relatório (o total é sempre contado)
+
+
+def _format(path: str, fmt=None) -> str:
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt == "ndjson":
+        fmt = "jsonl"
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"formato não suportado: {fmt!r} (use csv ou jsonl)")
+    return fmt
+
+
+def _records(f, fmt: str):
+    """Gera (nº da linha, dict) do arquivo texto ``f``."""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+
+
+def read_chunks(path: str, fmt=None, chunk_size: int = 50_000, report=None):
+    """Gera listas de até ``chunk_size`` pares (isbn, livro) já validados.
+
+    ``report`` (dict, opcional) é atualizado a cada bloco: ``read``,
+    ``rejected``, ``errors`` (as primeiras linhas inválidas, como
+    (linha, mensagem)) e ``fraction`` (parte do arquivo já lida).
+    """
+    fmt = _format(path, fmt)
+    size = os.path.getsize(path) or 1
+    if report is None:
+        report = {}
+    report.update(read=0, rejected=0, errors=[], fraction=0.0)
+    with open(path, "rb") as raw:
+        # o TextIOWrapper lê adiantado do arquivo binário: raw.tell() dá o
+        # progresso aproximado sem precisar de f.tell() (proibido no laço)
+        f = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        chunk = []
+        for line_no, rec in _records(f, fmt):
+            report["read"] += 1
+            try:
+                if isinstance(rec, Exception):
+                    raise ValueError(f"JSON inválido: {rec}")
+                if not isinstance(rec, dict):
+                    raise ValueError("registro não é um objeto")
+                livro = validate_book(*(rec.get(k) for k in FIELDS))
+            except ValueError as e:
+                report["rejected"] += 1
+                if len(report["errors"]) < _MAX_ERRORS:
+                    report["errors"].append((line_no, str(e)))
+                continue
+            chunk.append((livro["isbn"], livro))
+            if len(chunk) >= chunk_size:
+                report["fraction"] = min(1.0, raw.tell() / size)
+                yield chunk
+                chunk = []
+        report["fraction"] = 1.0
+        if chunk:
+            yield chunk
+
+
+def import_books(tree: RedBlackTree, path: str, fmt=None, chunk_size: int = 50_000,
+                 progress=None) -> dict:
+    """Importa os livros de ``path`` para ``tree`` e devolve um relatório.
+
+    Linhas inválidas são puladas e contadas (ver ``read_chunks``).
+    ``progress(relatório)`` é chamado após cada bloco inserido.
+    """
+    report = {"added": 0, "updated": 0, "seconds": 0.0, "rate": 0.0}
+    t0 = time.perf_counter()
+    for chunk in read_chunks(path, fmt, chunk_size, report):
+        added = tree.insert_many(chunk)
+        n_added = sum(added)
+        report["added"] += n_added
+        report["updated"] += len(added) - n_added
+        report["seconds"] = time.perf_counter() - t0
+        report["rate"] = report["read"] / report["seconds"] if report["seconds"] else 0.0
+        if progress is not None:
+            progress(report)
+    return report
+
+
+def export_books(source, path: str, fmt=None) -> int:
+    """Grava os livros de ``source`` (RedBlackTree ou DiskCatalogue) em ordem
+    de ISBN, sem montar a lista completa. Devolve quantos foram gravados."""
+    fmt = _format(path, fmt)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+            writer.writeheader()
+        for item in source.iter_items():
+            livro = item[1]
+            if fmt == "csv":
+                writer.writerow(livro)
+            else:
+                f.write(json.dumps(livro, ensure_ascii=False))
+                f.write("\n")
+            count += 1
+    return count
+
+
+def _print_progress(report):
+    print(f"\r  {report['fraction']:6.1%}  {report['read']:>12,} lidos  "
+          f"{report['rate']:>10,.0f} livros/s", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa/exporta o catálogo (CSV ou JSONL)")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", help="arquivo .csv ou .jsonl")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="ignora a extensão do arquivo")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--db", help="acervo persistente (ver storage.py)")
+    target.add_argument("--snapshot", help="snapshot binário (RedBlackTree.save/load)")
+    parser.add_argument("--chunk", type=int, default=50_000, help="livros por bloco na importação")
+    parser.add_argument("--compress", action="store_true", help="snapshot com zlib")
+    args = parser.parse_args(argv)
+
+    store = None
+    if args.db:
+        from storage import DiskCatalogue
+        store = DiskCatalogue(args.db, key_codec=ISBN_CODEC)
+        source = store
+    elif os.path.exists(args.snapshot):
+        source = RedBlackTree.load(args.snapshot, key_codec=ISBN_CODEC)
+    else:
+        source = RedBlackTree(key_codec=ISBN_CODEC)
+
+    try:
+        if args.command == "export":
+            t0 = time.perf_counter()
+            count = export_books(source, args.file, args.format)
+            print(f"{count:,} livros exportados em {time.perf_counter() - t0:.1f}s")
+            return
+        tree = store.to_tree() if store is not None else source
+        report = import_books(tree, args.file, args.format, args.chunk, _print_progress)
+        print(file=sys.stderr)
+        # grava de uma vez: um checkpoint novo (sem WAL) ou o snapshot
+        if store is not None:
+            store.rewrite((k, d) for k, d, _ in tree.iter_items())
+        else:
+            tree.save(args.snapshot, compress=args.compress)
+        print(f"{report['read']:,} lidos: {report['added']:,} novos, {report['updated']:,} atualizados, "
+              f"{report['rejected']:,} rejeitados ({report['rate']:,.0f} livros/s)")
+        for line_no, msg in report["errors"][:10]:
+            print(f"  linha {line_no}: {msg}")
+    finally:
+        if store is not None:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
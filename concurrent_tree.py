@@ -0,0 +1,195 @@
+"""RedBlackTree compartilhada entre threads (vários leitores, um escritor).
+
+A GIL não basta: uma rotação são várias atribuições de ponteiros e uma
+thread pode ser interrompida no meio dela, deixando outra ler a árvore
+meio girada. ``ConcurrentRedBlackTree`` protege a árvore com um
+``RWLock``: leituras (search, rank, consultas por índice...) correm juntas;
+escritas (insert, delete, lotes) esperam as leituras em curso e bloqueiam
+novas leituras enquanto duram.
+
+Iteradores devolvem uma fotografia: os itens são copiados para uma lista
+sob o lock de leitura e percorridos depois, sem segurar o lock. Para
+percorrer sem copiar, use ``with t.read_locked() as tree:`` (os escritores
+esperam até o fim do bloco).
+"""
+import threading
+from contextlib import contextmanager, nullcontext
+
+from rbtree import RedBlackTree
+
+
+class RWLock:
+    """Lock de leitores/escritor com preferência para escritores.
+
+    Um escritor esperando barra novos leitores, para que um fluxo contínuo
+    de consultas não impeça a ingestão. Não é reentrante.
+    """
+
+    def __init__(self):
+        mutex = threading.Lock()
+        self._mutex = mutex
+        # condições separadas: quem sai acorda só quem pode entrar (o fim da
+        # última leitura acorda um escritor, não todos os leitores barrados)
+        self._can_read = threading.Condition(mutex)
+        self._can_write = threading.Condition(mutex)
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        # ``with lock.read:`` / ``with lock.write:`` (sem o custo de um
+        # gerador de contextmanager a cada consulta)
+        self.read = _Side(self.acquire_read, self.release_read)
+        self.write = _Side(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        with self._mutex:
+            while self._writer or self._writers_waiting:
+                self._can_read.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._mutex:
+            self._readers -= 1
+            if not self._readers and self._writers_waiting:
+                self._can_write.notify()
+
+    def acquire_write(self):
+        with self._mutex:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._can_write.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._mutex:
+            self._writer = False
+            if self._writers_waiting:
+                self._can_write.notify()
+            else:
+                self._can_read.notify_all()
+
+
+class _Side:
+    """Um dos lados (leitura ou escrita) de um RWLock, para uso com ``with``."""
+    __slots__ = ("acquire", "release")
+
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ConcurrentRedBlackTree:
+    """Fachada thread-safe sobre uma RedBlackTree.
+
+    As consultas devolvem os dados (como ``DiskCatalogue.search``), não os
+    nós: um nó pode ser girado ou removido assim que o lock é liberado.
+    """
+
+    def __init__(self, tree: RedBlackTree = None, **kwargs):
+        """Envolve ``tree`` ou cria uma RedBlackTree com ``kwargs``.
+
+        Depois de envolvida, a árvore só deve ser acessada por aqui.
+        """
+        self._tree = RedBlackTree(**kwargs) if tree is None else tree
+        self._lock = RWLock()
+        # o cache LRU e as métricas (contadores, histogramas) são alterados
+        # pelas consultas: com eles ligados, os leitores se revezam nesse trecho
+        tree = self._tree
+        shared = tree._cache is not None or tree._metrics is not None
+        self._shared = threading.Lock() if shared else nullcontext()
+
+    @contextmanager
+    def read_locked(self):
+        """A árvore crua sob o lock de leitura (não alterá-la dentro do bloco)."""
+        with self._lock.read:
+            yield self._tree
+
+    @contextmanager
+    def write_locked(self):
+        """A árvore crua sob o lock de escrita (várias operações atômicas)."""
+        with self._lock.write:
+            yield self._tree
+
+    def __len__(self):
+        return len(self._tree)  # leitura de um inteiro: atômica
+
+    # ---------- Leitura ----------
+    def search(self, key):
+        """Dados da chave ou None."""
+        with self._lock.read, self._shared:
+            node = self._tree.search(key)
+            return None if node is None else node.data
+
+    def __contains__(self, key):
+        with self._lock.read, self._shared:
+            return self._tree._find_node(key) is not None
+
+    def search_many(self, keys):
+        """Lista com os dados (ou None) de cada chave, na ordem de ``keys``."""
+        with self._lock.read, self._shared:
+            return [None if n is None else n.data for n in self._tree.search_many(keys)]
+
+    def rank(self, key) -> int:
+        with self._lock.read:
+            return self._tree.rank(key)
+
+    def select(self, i: int):
+        """(chave, dados) do i-ésimo item em ordem."""
+        with self._lock.read:
+            node = self._tree.select(i)
+            return node.key, node.data
+
+    def count_range(self, lo=None, hi=None) -> int:
+        with self._lock.read:
+            return self._tree.count_range(lo, hi)
+
+    # ---------- Iteração (fotografias) ----------
+    def _snapshot(self, items):
+        with self._lock.read:
+            return iter(list(items))
+
+    def iter_items(self, reverse=False):
+        return self._snapshot(self._tree.iter_items(reverse))
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        return self._snapshot(self._tree.iter_range(lo, hi, reverse))
+
+    def find_prefix(self, name: str, prefix):
+        return self._snapshot(self._tree.find_prefix(name, prefix))
+
+    def find_range(self, name: str, lo=None, hi=None):
+        return self._snapshot(self._tree.find_range(name, lo, hi))
+
+    def inorder(self):
+        return list(self.iter_items())
+
+    # ---------- Escrita ----------
+    def insert(self, key, data) -> bool:
+        with self._lock.write:
+            return self._tree.insert(key, data)
+
+    def delete(self, key) -> bool:
+        with self._lock.write:
+            return self._tree.delete(key)
+
+    def insert_many(self, items):
+        with self._lock.write:
+            return self._tree.insert_many(items)
+
+    def delete_many(self, keys):
+        with self._lock.write:
+            return self._tree.delete_many(keys)
+
+    def bulk_load(self, items):
+        with self._lock.write:
+            return self._tree.bulk_load(items)
+
+    def add_index(self, name: str, extract, encode=str):
+        with self._lock.write:
+            self._tree.add_index(name, extract, encode)
@@ -0,0 +1,83 @@
+"""Chaves de ISBN normalizadas em inteiros de largura fixa.
+
+Como string, "978-85-359-0277-8" e "9788535902778" seriam livros
+diferentes, e cada nível da árvore compara strings. ``IsbnCodec`` remove
+hífens e espaços, converte ISBN-10 (com dígito verificador válido) para
+ISBN-13 e empacota os dígitos num inteiro de até 48 bits:
+
+    (dígitos completados com zeros à direita até 13) << 4 | nº de dígitos
+
+A ordem dos inteiros é a ordem lexicográfica dos dígitos, então faixas e
+prefixos (``iter_range("978", "979")``) continuam valendo. Os 4 bits de
+tamanho mantêm distintos os códigos curtos legados ("978184" não é
+"9781840000000"). O texto digitado continua em ``livro["isbn"]`` para a
+interface; ``decode`` devolve a forma canônica (só dígitos).
+
+Uso: ``RedBlackTree(key_codec=ISBN_CODEC)``. Inteiros são tratados como
+chaves já codificadas (as que ``iter_items`` devolve).
+"""
+_DIGITS = 13
+_DROP = str.maketrans("", "", "- ")
+
+
+def isbn10_check(first9: str) -> str:
+    """Dígito verificador do ISBN-10 (0-9 ou X)."""
+    total = sum((10 - i) * int(c) for i, c in enumerate(first9))
+    check = -total % 11
+    return "X" if check == 10 else str(check)
+
+
+def isbn13_check(first12: str) -> str:
+    """Dígito verificador do ISBN-13 (EAN-13)."""
+    total = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(first12))
+    return str(-total % 10)
+
+
+def _is_isbn10(s: str) -> bool:
+    return len(s) == 10 and s[:9].isdigit() and s[:9].isascii() and isbn10_check(s[:9]) == s[9]
+
+
+class IsbnCodec:
+    """Converte ISBNs em inteiros ordenáveis e de volta.
+
+    ``strict=True`` aceita só ISBN-10/13 com dígito verificador correto;
+    por padrão, qualquer código de 1 a 13 dígitos é aceito (códigos curtos
+    legados, ISBN-13 com verificador errado).
+    """
+    __slots__ = ("strict",)
+
+    def __init__(self, strict: bool = False):
+        self.strict = strict
+
+    def normalize(self, key) -> str:
+        """Forma canônica: ISBN-13 (ou o código legado) só com dígitos."""
+        if isinstance(key, int):
+            return self.decode(key)
+        s = str(key).strip().translate(_DROP).upper()
+        if len(s) == 10 and _is_isbn10(s):
+            s = "978" + s[:9]
+            return s + isbn13_check(s)
+        if not (s.isdigit() and s.isascii() and 0 < len(s) <= _DIGITS):
+            raise ValueError(f"ISBN inválido: {key!r}")
+        if self.strict and (len(s) != _DIGITS or isbn13_check(s[:12]) != s[12]):
+            raise ValueError(f"ISBN com dígito verificador inválido: {key!r}")
+        return s
+
+    def encode(self, key) -> int:
+        if isinstance(key, int):
+            return key
+        # caminho rápido: ISBN-13 já sem hífens (o caso comum nas buscas)
+        if type(key) is str and len(key) == _DIGITS and not self.strict and key.isdigit() and key.isascii():
+            return int(key) << 4 | _DIGITS
+        s = self.normalize(key)
+        return int(s.ljust(_DIGITS, "0")) << 4 | len(s)
+
+    @staticmethod
+    def decode(code: int) -> str:
+        return str(code >> 4).zfill(_DIGITS)[:code & 15]
+
+    def __repr__(self):
+        return f"IsbnCodec(strict={self.strict})"
+
+
+ISBN_CODEC = IsbnCodec()
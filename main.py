@@ -1,268 +1,58 @@
+import argparse
+import gc
+import operator
+import queue
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
-from dataclasses import dataclass
-
-# ===============================
-# Red-Black Tree (inserção, remoção, busca)
-# ===============================
-
-@dataclass(eq=False)  # importante p/ usar _Node como chave de dict (hash por identidade)
-class _Node:
-    key: str
-    data: dict
-    color: str = "RED"   # "RED" ou "BLACK"
-    left:  "._Node" = None
-    right: "._Node" = None
-    parent: "._Node" = None
-
-
-class RedBlackTree:
-    def __init__(self):
-        self.NULL = _Node(key=None, data=None, color="BLACK")
-        self.NULL.left = self.NULL.right = self.NULL.parent = self.NULL
-        self.root = self.NULL
-
-    # ---------- Utilidades ----------
-    def _transplant(self, u: _Node, v: _Node):
-        """Substitui o subárvore enraizado em u pelo de v (clássico de BST)."""
-        if u.parent == self.NULL:
-            self.root = v
-        elif u == u.parent.left:
-            u.parent.left = v
-        else:
-            u.parent.right = v
-        v.parent = u.parent
-
-    def _minimum(self, x: _Node):
-        while x.left != self.NULL:
-            x = x.left
-        return x
-
-    # ---------- Rotações ----------
-    def _left_rotate(self, x: _Node):
-        y = x.right
-        x.right = y.left
-        if y.left != self.NULL:
-            y.left.parent = x
-        y.parent = x.parent
-        if x.parent == self.NULL:
-            self.root = y
-        elif x == x.parent.left:
-            x.parent.left = y
-        else:
-            x.parent.right = y
-        y.left = x
-        x.parent = y
-
-    def _right_rotate(self, x: _Node):
-        y = x.left
-        x.left = y.right
-        if y.right != self.NULL:
-            y.right.parent = x
-        y.parent = x.parent
-        if x.parent == self.NULL:
-            self.root = y
-        elif x == x.parent.right:
-            x.parent.right = y
-        else:
-            x.parent.left = y
-        y.right = x
-        x.parent = y
-
-    # ---------- Inserção ----------
-    def insert(self, key: str, data: dict):
-        key = str(key)
-        z = _Node(key=key, data=data, color="RED",
-                  left=self.NULL, right=self.NULL, parent=self.NULL)
-
-        y = self.NULL
-        x = self.root
-        while x != self.NULL:
-            y = x
-            if z.key < x.key:
-                x = x.left
-            elif z.key > x.key:
-                x = x.right
-            else:
-                # chave já existe -> atualizar conteúdo e sair
-                x.data = data
-                return
-
-        z.parent = y
-        if y == self.NULL:
-            self.root = z
-        elif z.key < y.key:
-            y.left = z
-        else:
-            y.right = z
-
-        self._insert_fixup(z)
-
-    def _insert_fixup(self, z: _Node):
-        # Casos 1,2,3 e versões espelhadas (conforme slide de referência)
-        while z.parent.color == "RED":
-            if z.parent == z.parent.parent.left:
-                y = z.parent.parent.right  # tio
-                if y.color == "RED":
-                    # Caso 1: tio vermelho -> recoloração e sobe
-                    z.parent.color = "BLACK"
-                    y.color = "BLACK"
-                    z.parent.parent.color = "RED"
-                    z = z.parent.parent
-                else:
-                    if z == z.parent.right:
-                        # Caso 2: triângulo (dir) -> rot. esquerda para virar caso 3
-                        z = z.parent
-                        self._left_rotate(z)
-                    # Caso 3: linha (esq) -> recoloração + rot. direita
-                    z.parent.color = "BLACK"
-                    z.parent.parent.color = "RED"
-                    self._right_rotate(z.parent.parent)
-            else:
-                # espelho: troca left<->right
-                y = z.parent.parent.left
-                if y.color == "RED":
-                    z.parent.color = "BLACK"
-                    y.color = "BLACK"
-                    z.parent.parent.color = "RED"
-                    z = z.parent.parent
-                else:
-                    if z == z.parent.left:
-                        z = z.parent
-                        self._right_rotate(z)
-                    z.parent.color = "BLACK"
-                    z.parent.parent.color = "RED"
-                    self._left_rotate(z.parent.parent)
-        self.root.color = "BLACK"
-
-    # ---------- Remoção ----------
-    def delete(self, key: str) -> bool:
-        """Remove a chave se existir. Retorna True se removeu, False se não encontrou."""
-        key = str(key)
-        z = self._find_node(key)
-        if z is None:
-            return False
-
-        y = z
-        y_original_color = y.color
-        if z.left == self.NULL:
-            x = z.right
-            self._transplant(z, z.right)
-        elif z.right == self.NULL:
-            x = z.left
-            self._transplant(z, z.left)
-        else:
-            # sucessor
-            y = self._minimum(z.right)
-            y_original_color = y.color
-            x = y.right
-            if y.parent == z:
-                x.parent = y
-            else:
-                self._transplant(y, y.right)
-                y.right = z.right
-                y.right.parent = y
-            self._transplant(z, y)
-            y.left = z.left
-            y.left.parent = y
-            y.color = z.color
-
-        if y_original_color == "BLACK":
-            self._delete_fixup(x)
-        return True
-
-    def _delete_fixup(self, x: _Node):
-        # Trata "duplo-preto" em x até restaurar as propriedades
-        while x != self.root and x.color == "BLACK":
-            if x == x.parent.left:
-                w = x.parent.right  # irmão
-                if w.color == "RED":
-                    # Caso 1: irmão vermelho
-                    w.color = "BLACK"
-                    x.parent.color = "RED"
-                    self._left_rotate(x.parent)
-                    w = x.parent.right
-                if w.left.color == "BLACK" and w.right.color == "BLACK":
-                    # Caso 2: irmão preto com dois filhos pretos
-                    w.color = "RED"
-                    x = x.parent
-                else:
-                    if w.right.color == "BLACK":
-                        # Caso 3: irmão preto, filho esquerdo vermelho, direito preto
-                        w.left.color = "BLACK"
-                        w.color = "RED"
-                        self._right_rotate(w)
-                        w = x.parent.right
-                    # Caso 4: irmão preto, filho direito vermelho
-                    w.color = x.parent.color
-                    x.parent.color = "BLACK"
-                    w.right.color = "BLACK"
-                    self._left_rotate(x.parent)
-                    x = self.root
-            else:
-                # espelho: troca left<->right
-                w = x.parent.left
-                if w.color == "RED":
-                    w.color = "BLACK"
-                    x.parent.color = "RED"
-                    self._right_rotate(x.parent)
-                    w = x.parent.left
-                if w.right.color == "BLACK" and w.left.color == "BLACK":
-                    w.color = "RED"
-                    x = x.parent
-                else:
-                    if w.left.color == "BLACK":
-                        w.right.color = "BLACK"
-                        w.color = "RED"
-                        self._left_rotate(w)
-                        w = x.parent.left
-                    w.color = x.parent.color
-                    x.parent.color = "BLACK"
-                    w.left.color = "BLACK"
-                    self._right_rotate(x.parent)
-                    x = self.root
-
-        x.color = "BLACK"
-
-    # ---------- Busca/Travessias ----------
-    def _find_node(self, key: str):
-        key = str(key)
-        x = self.root
-        while x != self.NULL:
-            if key == x.key:
-                return x
-            x = x.left if key < x.key else x.right
-        return None
-
-    def search(self, key: str):
-        return self._find_node(key)
-
-    def inorder(self):
-        res = []
-        def _in(n):
-            if n == self.NULL: return
-            _in(n.left)
-            res.append((n.key, n.data, n.color))
-            _in(n.right)
-        _in(self.root)
-        return res
+from itertools import islice
+from tkinter import ttk, messagebox, filedialog
 
+from btree import BTree
+from catalog_io import read_chunks
+from isbn import ISBN_CODEC
+from rbtree import RedBlackTree, _gc_paused, add_book_indexes, validate_book
+from storage import COMPACT_LOG_BYTES, DiskCatalogue
 
 # ===============================
 # GUI (Tkinter + ttk)
 # ===============================
 
 class App:
-    def __init__(self, root):
+    def __init__(self, root, store=None, engine=None):
+        """``store``: catálogo persistente opcional (storage.DiskCatalogue).
+        Sem ele, a árvore vive só em memória e é semeada com exemplos.
+        ``engine``: classe do motor (CatalogueEngine); padrão RedBlackTree.
+        A aba de visualização só existe para a RedBlackTree."""
         self.root = root
+        self.store = store
         self.root.title("Catálogo de Livros — Árvore Rubro-Negra (IME/USP-style)")
         self.root.geometry("1040x680")
         self.root.minsize(940, 580)
 
-        self.tree = RedBlackTree()
+        engine = engine or RedBlackTree
+        if store is not None:
+            # o DiskCatalogue abre sem reconstruir nada; a lista e o canvas,
+            # porém, navegam numa árvore em memória (select/rank), montada
+            # aqui em O(n) a partir dos registros já ordenados
+            self.tree = store.to_tree(engine, order_stats=True, key_codec=ISBN_CODEC)
+            self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        else:
+            # select/rank alimentam a lista virtual; "978-85-..." e "97885..."
+            # são o mesmo livro (ver isbn.py)
+            self.tree = engine(order_stats=True, key_codec=ISBN_CODEC)
+        # índices de título/autor/ano: só na primeira busca por eles (_search_index),
+        # para não somar à abertura de um acervo grande
+        self._indexed = False
+        # importação em segundo plano (ver _on_import)
+        self._jobs = queue.Queue(maxsize=32)
+        self._job_cancel = None
+        self._canvas_stale = False
+        self._last_canvas = 0.0
         self._make_style()
         self._build_layout()
-        self._seed_examples()
+        if len(self.tree) == 0:
+            self._seed_examples()
 
     def _make_style(self):
         style = ttk.Style(self.root)
@@ -328,11 +118,13 @@ class App:
         # Card: Buscar
         card2 = ttk.Frame(sidebar, padding=12, style="Card.TFrame")
         card2.pack(fill="x", pady=14)
-        ttk.Label(card2, text="Buscar por ISBN", style="Title.TLabel").pack(anchor="w")
+        ttk.Label(card2, text="Buscar", style="Title.TLabel").pack(anchor="w")
         frm_b = ttk.Frame(card2)
         frm_b.pack(fill="x", pady=(6,0))
         self.var_busca = tk.StringVar()
-        ttk.Label(frm_b, text="ISBN").grid(row=0, column=0, sticky="w", pady=4)
+        self.var_campo = tk.StringVar(value="ISBN")
+        ttk.Combobox(frm_b, textvariable=self.var_campo, values=list(self._SEARCH_FIELDS),
+                     state="readonly", width=7).grid(row=0, column=0, sticky="w", pady=4, padx=(0,6))
         ttk.Entry(frm_b, textvariable=self.var_busca, width=28).grid(row=0, column=1, sticky="we", pady=4)
         ttk.Button(card2, text="Buscar", command=self._on_search).pack(anchor="w", pady=(8,0))
 
@@ -347,9 +139,26 @@ class App:
         ttk.Entry(frm_r, textvariable=self.var_remove, width=28).grid(row=0, column=1, sticky="we", pady=4)
         ttk.Button(card3, text="Remover", command=self._on_remove).pack(anchor="w", pady=(8,0))
 
+        # Card: Importar
+        card4 = ttk.Frame(sidebar, padding=12, style="Card.TFrame")
+        card4.pack(fill="x", pady=(14,0))
+        ttk.Label(card4, text="Importar arquivo", style="Title.TLabel").pack(anchor="w")
+        self.var_import = tk.StringVar(value="CSV ou JSONL (isbn, titulo, autor, ano)")
+        ttk.Label(card4, textvariable=self.var_import, style="Sub.TLabel", wraplength=260).pack(anchor="w", pady=(2,6))
+        self._import_bar = ttk.Progressbar(card4, maximum=100, mode="determinate")
+        self._import_bar.pack(fill="x")
+        btns_i = ttk.Frame(card4)
+        btns_i.pack(fill="x", pady=(8,0))
+        self._btn_import = ttk.Button(btns_i, text="Importar…", command=self._on_import)
+        self._btn_import.pack(side="left")
+        self._btn_cancel = ttk.Button(btns_i, text="Cancelar", command=self._on_cancel_import, state="disabled")
+        self._btn_cancel.pack(side="left", padx=8)
+
         # Main content (Notebook)
         main = ttk.Notebook(body)
         main.pack(side="left", fill="both", expand=True)
+        self._notebook = main
+        main.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
         # Aba catálogo (lista em-ordem)
         self.tab_list = ttk.Frame(main, padding=12)
@@ -366,7 +175,18 @@ class App:
         self.treeview.column("autor", width=180)
         self.treeview.column("ano", width=60, anchor="center")
         self.treeview.column("cor", width=90, anchor="center")
+
+        # Lista virtual: a barra de rolagem é controlada por nós (posição na
+        # árvore), não pelo Treeview, que só guarda as linhas visíveis.
+        self._list_top = 0
+        self._list_rows = 14
+        self._list_scroll = ttk.Scrollbar(self.tab_list, orient="vertical", command=self._on_list_scroll)
+        self._list_scroll.pack(side="right", fill="y")
         self.treeview.pack(fill="both", expand=True)
+        self.treeview.bind("<Configure>", self._on_list_resize)
+        self.treeview.bind("<MouseWheel>", self._on_list_wheel)  # Windows
+        self.treeview.bind("<Button-4>", self._on_list_wheel)    # Linux
+        self.treeview.bind("<Button-5>", self._on_list_wheel)    # Linux
 
         # Aba árvore (visual)
         self.tab_tree = ttk.Frame(main, padding=12)
@@ -380,58 +200,76 @@ class App:
         self.canvas.grid(row=0, column=0, sticky="nsew")
         scy = ttk.Scrollbar(container, orient="vertical", command=self.canvas.yview)
         scx = ttk.Scrollbar(container, orient="horizontal", command=self.canvas.xview)
-        self.canvas.configure(yscrollcommand=scy.set, xscrollcommand=scx.set)
+        self.canvas.configure(yscrollcommand=lambda *a: self._on_view_change(scy, *a),
+                              xscrollcommand=lambda *a: self._on_view_change(scx, *a))
         scy.grid(row=0, column=1, sticky="ns")
         scx.grid(row=1, column=0, sticky="ew")
         container.columnconfigure(0, weight=1)
         container.rowconfigure(0, weight=1)
 
-        # Pan/Zoom
+        # Pan/Zoom + cache de layout/itens desenhados
         self._scale = 1.0
+        self._coords = None
+        self._height = 0
+        self._drawn = {}
+        self._sync_pending = False
         self.canvas.bind("<ButtonPress-1>", self._scan_start)
         self.canvas.bind("<B1-Motion>", self._scan_move)
         self.canvas.bind("<MouseWheel>", self._on_wheel)  # Windows
         self.canvas.bind("<Button-4>", self._on_wheel)    # Linux
         self.canvas.bind("<Button-5>", self._on_wheel)    # Linux
         ttk.Button(self.tab_tree, text="Recentrar/Redesenhar", command=self._redraw).pack(pady=8)
+        if not isinstance(self.tree, RedBlackTree):
+            main.tab(self.tab_tree, state="disabled")  # o desenho é o da RB-Tree
 
         # Rodapé
         footer = ttk.Frame(self.root)
         footer.pack(side="bottom", fill="x")
         ttk.Label(footer, text="Dica: arraste com botão esquerdo (pan) | Rodinha do mouse (zoom) | Clique no botão para recentrar").pack(padx=12, pady=6)
 
-        self._refresh_list()
+        self._render_list()
         self._redraw()
 
     # ---------- Ações ----------
     def _on_save(self):
-        isbn = self.var_isbn.get().strip()
-        titulo = self.var_titulo.get().strip()
-        autor = self.var_autor.get().strip() or "—"
-        ano = self.var_ano.get().strip()
-
-        if not isbn or not titulo:
-            messagebox.showerror("Campos obrigatórios", "Informe ao menos ISBN e Título.")
-            return
-
         try:
-            ano_int = int(ano) if ano else None
-        except ValueError:
-            messagebox.showerror("Valor inválido", "O campo Ano deve ser numérico.")
+            livro = validate_book(self.var_isbn.get(), self.var_titulo.get(),
+                                  self.var_autor.get(), self.var_ano.get())
+        except ValueError as e:
+            messagebox.showerror("Valor inválido", str(e))
             return
 
-        livro = {"isbn": str(isbn), "titulo": titulo, "autor": autor, "ano": ano_int}
-        self.tree.insert(livro["isbn"], livro)
-        self._refresh_list()
-        self._redraw()
+        if self.store is not None:
+            try:
+                self.store.insert(livro["isbn"], livro)  # WAL antes da árvore
+            except ValueError as e:
+                messagebox.showerror("Valor inválido", str(e))
+                return
+        added = self.tree.insert(livro["isbn"], livro)
+        self._list_changed(livro["isbn"], 1 if added else 0)
+        if added:
+            self._tree_changed()
         messagebox.showinfo("Sucesso", "Livro inserido/atualizado.")
 
+    # rótulo -> índice secundário (None = chave primária)
+    _SEARCH_FIELDS = {"ISBN": None, "Título": "titulo", "Autor": "autor", "Ano": "ano"}
+    _SEARCH_LIMIT = 50
+
     def _on_search(self):
-        isbn = (self.var_busca.get() or "").strip()
-        if not isbn:
-            messagebox.showwarning("Busca", "Informe o ISBN para buscar.")
+        campo = self.var_campo.get()
+        termo = (self.var_busca.get() or "").strip()
+        if not termo:
+            messagebox.showwarning("Busca", f"Informe o {campo} para buscar.")
+            return
+        index = self._SEARCH_FIELDS[campo]
+        if index is not None:
+            self._search_index(campo, index, termo)
+            return
+        try:
+            node = self.tree.search(termo)
+        except ValueError as e:
+            messagebox.showerror("Valor inválido", str(e))
             return
-        node = self.tree.search(isbn)
         if node:
             livro = node.data
             messagebox.showinfo("Encontrado",
@@ -439,106 +277,482 @@ class App:
         else:
             messagebox.showerror("Não encontrado", "Nenhum livro com esse ISBN.")
 
+    def _search_index(self, campo, index, termo):
+        if not self._indexed:
+            add_book_indexes(self.tree)  # O(n log n) uma vez; depois mantidos pela árvore
+            self._indexed = True
+        if index == "ano":
+            # "1950" ou faixa "1930-1960"
+            lo, sep, hi = termo.partition("-")
+            try:
+                lo = int(lo)
+                hi = int(hi) if sep else lo
+            except ValueError:
+                messagebox.showerror("Valor inválido", "Ano: use 1950 ou 1930-1960.")
+                return
+            hits = self.tree.find_range(index, lo, hi)
+        else:
+            hits = self.tree.find_prefix(index, termo)
+        rows = list(islice(hits, self._SEARCH_LIMIT + 1))
+        if not rows:
+            messagebox.showerror("Não encontrado", f"Nenhum livro com {campo} \"{termo}\".")
+            return
+        lines = [f"{d['isbn']} — {d['titulo']} ({d['autor']}, {d['ano']})" for _, d, _ in rows[:self._SEARCH_LIMIT]]
+        if len(rows) > self._SEARCH_LIMIT:
+            lines.append(f"... (mostrando os {self._SEARCH_LIMIT} primeiros)")
+        messagebox.showinfo("Encontrados", "\n".join(lines))
+
+    def _on_close(self):
+        if self._job_cancel is not None:
+            self._job_cancel.set()
+        # compacta o WAL no arquivo de nós para a próxima abertura, se ele
+        # já pesa; um log curto é só reaplicado (regravar custa O(n))
+        self.store.checkpoint(COMPACT_LOG_BYTES)
+        self.store.close()
+        self.root.destroy()
+
     def _on_remove(self):
         isbn = (self.var_remove.get() or "").strip()
         if not isbn:
             messagebox.showwarning("Remoção", "Informe o ISBN para remover.")
             return
-        ok = self.tree.delete(isbn)
+        try:
+            ok = self.tree.delete(isbn)
+        except ValueError as e:
+            messagebox.showerror("Valor inválido", str(e))
+            return
+        if ok and self.store is not None:
+            self.store.delete(isbn)
         if ok:
-            self._refresh_list()
-            self._redraw()
+            self._list_changed(isbn, -1)
+            self._tree_changed()
             messagebox.showinfo("Remoção", f"Livro {isbn} removido.")
         else:
             messagebox.showerror("Remoção", "ISBN não encontrado.")
 
-    # ---------- Lista em-ordem ----------
-    def _refresh_list(self):
-        for i in self.treeview.get_children():
-            self.treeview.delete(i)
-        for key, data, color in self.tree.inorder():
-            self.treeview.insert("", "end", values=(data["isbn"], data["titulo"], data["autor"], data["ano"], color))
+    # ---------- Importação em segundo plano ----------
+    # A thread lê, valida e ordena o arquivo em blocos; a árvore só é
+    # alterada aqui, no laço do Tk (a lista e o canvas a leem sem lock), em
+    # fatias de no máximo _POLL_BUDGET por rodada. Cada rodada gera um
+    # único refresh da lista; o canvas é refeito no máximo a cada
+    # _CANVAS_REFRESH segundos, e só se a aba da árvore estiver visível.
+    # O GC cíclico fica desligado durante a importação (ver _gc_paused):
+    # com centenas de milhares de nós, cada coleta completa trava a
+    # interface por ~1 s. Ele é religado em _finish_import, que sempre
+    # roda: a thread posta "done" ou "error" mesmo se a leitura falhar.
+    _IMPORT_CHUNK = 1_000
+    _POLL_MS = 50
+    _POLL_BUDGET = 0.03
+    _CANVAS_REFRESH = 1.0
+
+    def _on_import(self):
+        if self._job_cancel is not None:
+            return
+        path = filedialog.askopenfilename(
+            title="Importar livros",
+            filetypes=[("CSV ou JSONL", "*.csv *.jsonl *.ndjson"), ("Todos os arquivos", "*.*")])
+        if not path:
+            return
+        self._job_cancel = cancel = threading.Event()
+        self._import_report = report = {}
+        self._import_stats = {"added": 0, "updated": 0, "rejected": 0}
+        self._gc_was_enabled = gc.isenabled()
+        gc.disable()
+        self._import_bar["value"] = 0
+        self._btn_import.state(["disabled"])
+        self._btn_cancel.state(["!disabled"])
+        self.var_import.set("Lendo arquivo…")
+        worker = threading.Thread(target=self._import_worker, args=(read_chunks, path, cancel, report), daemon=True)
+        worker.start()
+        self.root.after(self._POLL_MS, self._poll_jobs)
+
+    def _import_worker(self, read_chunks, path, cancel, report):
+        """Thread de leitura: só produz blocos para a fila."""
+        final = ("done", None, 1.0)
+        try:
+            for chunk in read_chunks(path, chunk_size=self._IMPORT_CHUNK, report=report):
+                chunk.sort(key=operator.itemgetter(0))  # estável: repetidos mantêm a ordem
+                while not cancel.is_set():
+                    try:
+                        self._jobs.put(("chunk", chunk, report["fraction"]), timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if cancel.is_set():
+                    break
+        except Exception as e:  # csv.Error, UnicodeError, ... : nada pode deixar o laço esperando
+            final = ("error", str(e) or type(e).__name__, 0.0)
+        finally:
+            self._jobs.put(final)  # _poll_jobs drena a fila até a mensagem final
+
+    def _on_cancel_import(self):
+        if self._job_cancel is not None:
+            self._job_cancel.set()
+            self.var_import.set("Cancelando…")
+
+    def _poll_jobs(self):
+        deadline = time.monotonic() + self._POLL_BUDGET
+        changed, finished = False, None
+        while time.monotonic() < deadline:
+            try:
+                kind, payload, fraction = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if kind != "chunk":
+                finished = (kind, payload)
+                break
+            if self._job_cancel.is_set():
+                continue  # blocos que já estavam na fila ao cancelar
+            self._apply_chunk(payload)
+            changed = True
+            self._import_bar["value"] = fraction * 100
+            self.var_import.set(f"{fraction:.0%} — {self._import_report.get('read', 0):,} livros lidos")
+        if changed:
+            self._refresh_views()
+        if finished is not None:
+            self._finish_import(*finished)
+        else:
+            self.root.after(self._POLL_MS, self._poll_jobs)
+
+    def _apply_chunk(self, chunk):
+        stats = self._import_stats
+        if self.store is not None:
+            accepted = []
+            for isbn, livro in chunk:
+                try:
+                    self.store.insert(isbn, livro)  # WAL antes da árvore
+                except ValueError:
+                    stats["rejected"] += 1
+                    continue
+                accepted.append((isbn, livro))
+            chunk = accepted
+        added = self.tree.insert_many(chunk)
+        n_added = sum(added)
+        stats["added"] += n_added
+        stats["updated"] += len(added) - n_added
+
+    def _refresh_views(self):
+        """Um refresh para todas as alterações aplicadas numa rodada."""
+        self._render_list()
+        now = time.monotonic()
+        if now - self._last_canvas >= self._CANVAS_REFRESH:
+            self._last_canvas = now
+            self._tree_changed()
+        else:
+            self._coords = None
+            self._canvas_stale = True
+
+    def _finish_import(self, kind, payload):
+        cancelled = self._job_cancel.is_set()
+        self._job_cancel = None
+        if self._gc_was_enabled:
+            gc.enable()
+        self._btn_import.state(["!disabled"])
+        self._btn_cancel.state(["disabled"])
+        self._render_list()
+        self._tree_changed()
+        if kind == "error":
+            self.var_import.set("Falha na importação.")
+            messagebox.showerror("Importação", payload)
+            return
+        report, stats = self._import_report, self._import_stats
+        summary = (f"{stats['added']:,} novos, {stats['updated']:,} atualizados, "
+                   f"{report.get('rejected', 0) + stats['rejected']:,} rejeitados")
+        self.var_import.set(("Cancelada: " if cancelled else "Concluída: ") + summary)
+        if not cancelled:
+            self._import_bar["value"] = 100
+        details = "".join(f"\nlinha {n}: {msg}" for n, msg in report.get("errors", [])[:5])
+        messagebox.showinfo("Importação cancelada" if cancelled else "Importação concluída", summary + details)
+
+    # ---------- Lista em-ordem (virtual) ----------
+    # O Treeview só contém a janela visível (+ folga), lida da árvore por
+    # posição (select). Uma edição atualiza a janela, nunca a tabela inteira.
+    _LIST_BUFFER = 5
+    _LIST_ROW_HEIGHT = 20  # altura padrão de linha do ttk.Treeview
+
+    @staticmethod
+    def _row_values(data, color):
+        return (data["isbn"], data["titulo"], data["autor"], data["ano"], color)
+
+    def _render_list(self):
+        total = len(self.tree)
+        self._list_top = max(0, min(self._list_top, total - self._list_rows))
+        want = max(0, min(self._list_rows + self._LIST_BUFFER, total - self._list_top))
+        rows = []
+        if want:
+            start = self.tree.select(self._list_top).key
+            rows = [self._row_values(d, color) for _, d, color in islice(self.tree.iter_from(start), want)]
+
+        # reaproveita as linhas existentes (iids "row0", "row1", ...)
+        slots = self.treeview.get_children()
+        for i, values in enumerate(rows):
+            if i < len(slots):
+                self.treeview.item(slots[i], values=values)
+            else:
+                self.treeview.insert("", "end", iid=f"row{i}", values=values)
+        if len(slots) > len(rows):
+            self.treeview.delete(*slots[len(rows):])
+
+        if total:
+            self._list_scroll.set(self._list_top / total, min(1.0, (self._list_top + self._list_rows) / total))
+        else:
+            self._list_scroll.set(0.0, 1.0)
+
+    def _list_changed(self, key, delta):
+        """Reflete na lista a edição de ``key``.
+
+        ``delta``: +1 inserido, -1 removido, 0 só os dados mudaram.
+        """
+        pos = self.tree.rank(key)
+        if delta == 0:
+            offset = pos - self._list_top
+            if 0 <= offset < len(self.treeview.get_children()):
+                n = self.tree.select(pos)
+                self.treeview.item(f"row{offset}", values=self._row_values(n.data, n.color))
+            return
+        if pos < self._list_top:
+            self._list_top += delta  # mantém as mesmas linhas na tela
+        self._render_list()
+
+    def _list_scroll_to(self, top):
+        self._list_top = int(top)
+        self._render_list()
+
+    def _on_list_scroll(self, *args):
+        if args[0] == "moveto":
+            self._list_scroll_to(float(args[1]) * len(self.tree))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self._list_rows if args[2] == "pages" else 1)
+            self._list_scroll_to(self._list_top + step)
+
+    def _on_list_wheel(self, e):
+        if hasattr(e, "delta") and e.delta != 0:
+            step = -3 if e.delta > 0 else 3
+        else:
+            step = -3 if getattr(e, "num", 5) == 4 else 3
+        self._list_scroll_to(self._list_top + step)
+        return "break"  # impede a rolagem nativa dentro da janela
+
+    def _on_list_resize(self, e):
+        rows = max(1, (e.height - self._LIST_ROW_HEIGHT) // self._LIST_ROW_HEIGHT)
+        if rows != self._list_rows:
+            self._list_rows = rows
+            self._render_list()
 
     # ---------- Visualização da Árvore ----------
+    # O layout fica em coordenadas de "mundo" e em cache até a próxima edição;
+    # o canvas mostra mundo * escala. O zoom reescala os itens já criados
+    # (canvas.scale) e só ganham itens os nós na área visível e seus
+    # ancestrais. Níveis profundos demais para a escala viram um resumo "+N".
+    _DX, _DY, _R = 140, 120, 22
+    _MIN_SPACING = 16  # px mínimos entre vizinhos de um nível antes de colapsar
+
     def _scan_start(self, e):
         self.canvas.scan_mark(e.x, e.y)
 
     def _scan_move(self, e):
         self.canvas.scan_dragto(e.x, e.y, gain=1)
 
+    def _on_view_change(self, scrollbar, first, last):
+        # chamado pelo canvas em qualquer mudança de vista (pan, scroll, resize)
+        scrollbar.set(first, last)
+        self._schedule_sync()
+
     def _on_wheel(self, e):
         if hasattr(e, "delta") and e.delta != 0:
             factor = 1.1 if e.delta > 0 else 1/1.1
         else:
             factor = 1.1 if getattr(e, "num", 5) == 4 else 1/1.1
+        c = self.canvas
+        wx, wy = c.canvasx(e.x) / self._scale, c.canvasy(e.y) / self._scale
         self._scale *= factor
-        self._draw_tree()
+        c.scale("rb", 0, 0, factor, factor)
+        self._apply_label_font()
+        self._update_scrollregion()
+        # mantém sob o cursor o mesmo ponto da árvore
+        x0, y0, x1, y1 = (float(v) for v in c.cget("scrollregion").split())
+        c.xview_moveto((wx * self._scale - e.x - x0) / (x1 - x0))
+        c.yview_moveto((wy * self._scale - e.y - y0) / (y1 - y0))
+        self._schedule_sync()
 
     def _redraw(self):
+        if not isinstance(self.tree, RedBlackTree):
+            return
         self._scale = 1.0
+        self._coords = None
         self._draw_tree()
-
-    def _positions(self):
-        # X pela travessia em-ordem; Y pela profundidade
-        order = []
-        def inorder(n, depth=0):
-            if n == self.tree.NULL: return
-            inorder(n.left, depth+1)
-            order.append(n)
-            inorder(n.right, depth+1)
-        inorder(self.tree.root, 0)
-        x_index = {n: i for i, n in enumerate(order)}
-
-        coords = {}
-        def assign(n, depth=0):
-            if n == self.tree.NULL: return
-            x = x_index[n] * 140
-            y = depth * 120
-            coords[n] = (x, y)
-            assign(n.left, depth+1)
-            assign(n.right, depth+1)
-        assign(self.tree.root, 0)
-        return coords
+        if self.tree.root is not self.tree.NULL:
+            # recentra na raiz
+            c = self.canvas
+            x0, y0, x1, y1 = (float(v) for v in c.cget("scrollregion").split())
+            rx = self.tree.root.left.size * self._DX
+            c.xview_moveto((rx - c.winfo_width() / 2 - x0) / (x1 - x0))
+            c.yview_moveto(0.0)
+
+    def _tree_changed(self):
+        """Após inserir/remover: recalcula o layout e atualiza só o que mudou.
+
+        Com a aba da árvore escondida, só marca o canvas como desatualizado
+        (ver _on_tab_changed)."""
+        self._coords = None
+        if not self._canvas_visible():
+            self._canvas_stale = True
+            return
+        self._canvas_stale = False
+        self._update_scrollregion()
+        self._sync_canvas()
+
+    def _canvas_visible(self):
+        # outros motores: a aba fica desabilitada e o canvas nunca é desenhado
+        return isinstance(self.tree, RedBlackTree) and self._notebook.select() == str(self.tab_tree)
+
+    def _on_tab_changed(self, e):
+        if self._canvas_stale and self._canvas_visible():
+            self._tree_changed()
+
+    # X = posição em-ordem do nó, Y = profundidade. A posição sai dos
+    # tamanhos de subárvore durante a própria descida de _visible_nodes
+    # (filho esquerdo: pai - 1 - tamanho da subárvore direita do filho),
+    # então só os nós visitados têm coordenadas calculadas: O(visíveis),
+    # não O(n), a cada edição.
+    def _layout(self):
+        if self._coords is None:
+            self._coords = {}
+            # altura <= 2 x altura negra numa rubro-negra: limite em O(log n),
+            # já que a altura exata exigiria percorrer a árvore inteira
+            self._height = 2 * self.tree.black_height()
+        return self._coords
+
+    def _update_scrollregion(self):
+        self._layout()
+        s, pad = self._scale, 240
+        width = max(0, len(self.tree) - 1) * self._DX * s
+        self.canvas.config(scrollregion=(-pad, -pad, width + pad, self._height * self._DY * s + pad))
+
+    def _lod_depth(self):
+        """Nível mais profundo desenhado: abaixo dele os nós ficam a menos de
+        _MIN_SPACING px entre si (árvore balanceada: n / 2^d nós de distância)."""
+        spread = self._DX * self._scale * len(self.tree) / self._MIN_SPACING
+        return max(1, int(spread).bit_length() - 1)
+
+    def _visible_nodes(self):
+        """{nó: descendentes colapsados} para a área visível.
+
+        Busca em profundidade a partir da raiz, podando subárvores cujo
+        intervalo em-ordem (via ``size``) não cruza a tela. Os ancestrais dos
+        nós visíveis entram também, para as arestas longas que cruzam a tela.
+        """
+        c, s = self.canvas, self._scale
+        DX, DY, margin = self._DX, self._DY, 2 * self._R
+        coords, NULL = self._coords, self.tree.NULL
+        x0, x1 = c.canvasx(0) / s - margin, c.canvasx(c.winfo_width()) / s + margin
+        y1 = c.canvasy(c.winfo_height()) / s + margin
+        lod = self._lod_depth()
+        max_depth = min(lod, int(y1 // DY))
+
+        wanted = {}
+        root = self.tree.root
+        stack = [(root, root.left.size, 0)] if root is not NULL else []
+        while stack:
+            n, i, depth = stack.pop()
+            x = i * DX
+            coords[n] = (x, depth * DY)
+            if (x - n.left.size * DX) > x1 or (x + n.right.size * DX) < x0:
+                continue
+            if depth == lod and n.size > 1:
+                wanted[n] = n.size - 1
+                continue
+            wanted[n] = 0
+            if depth < max_depth:
+                left, right = n.left, n.right
+                if left is not NULL:
+                    stack.append((left, i - left.right.size - 1, depth + 1))
+                if right is not NULL:
+                    stack.append((right, i + right.left.size + 1, depth + 1))
+        return wanted
+
+    def _schedule_sync(self):
+        if not self._sync_pending:
+            self._sync_pending = True
+            self.root.after_idle(self._sync_canvas)
+
+    def _sync_canvas(self):
+        """Cria/atualiza/apaga itens até o canvas refletir a área visível."""
+        self._sync_pending = False
+        if not isinstance(self.tree, RedBlackTree):
+            return  # outros motores não têm visualização (ver _redraw)
+        c = self.canvas
+        if self.tree.root is self.tree.NULL or c.find_withtag("empty"):
+            self._draw_tree()
+            return
+        coords = self._layout()
+        wanted = self._visible_nodes()
+        drawn = self._drawn
+        for n in [n for n in drawn if n not in wanted]:
+            c.delete(*drawn.pop(n)[1:])
+
+        NULL = self.tree.NULL
+        for n, hidden in wanted.items():
+            p = n.parent
+            state = (coords[n], n.red, coords[p] if p is not NULL else None, hidden)
+            entry = drawn.get(n)
+            if entry is not None:
+                if entry[0] == state:
+                    continue
+                c.delete(*entry[1:])  # nó tocado pela edição (rotação/recoloração)
+            drawn[n] = self._create_node(n, state)
+        c.tag_raise("legend")
+
+    def _label_font(self):
+        return ("Segoe UI", max(6, int(10 * self._scale)), "bold")
+
+    def _apply_label_font(self):
+        state = "normal" if self._R * self._scale >= 9 else "hidden"
+        self.canvas.itemconfigure("label", font=self._label_font(), state=state)
+
+    def _create_node(self, n, state):
+        (x, y), red, parent_xy, hidden = state
+        c, s = self.canvas, self._scale
+        r = self._R * s
+        items = [state]
+        if parent_xy is not None:
+            line = c.create_line(parent_xy[0]*s, parent_xy[1]*s, x*s, y*s, width=2, fill="#9aa4b2", tags="rb")
+            c.tag_lower(line)
+            items.append(line)
+        fill = "#d43333" if red else "#1f2328"
+        outline = "#8b0000" if red else "#111417"
+        items.append(c.create_oval(x*s-r, y*s-r, x*s+r, y*s+r, fill=fill, outline=outline, width=2, tags="rb"))
+        key_txt = n.key
+        if not isinstance(key_txt, str):
+            codec = self.tree.key_codec
+            key_txt = codec.decode(key_txt) if codec is not None else str(key_txt)
+        items.append(c.create_text(x*s, y*s, fill="#ffffff", text=key_txt[:7], font=self._label_font(),
+                                   state="normal" if r >= 9 else "hidden", tags=("rb", "label")))
+        if hidden:
+            # resumo da subárvore colapsada
+            items.append(c.create_text(x*s, y*s + r + 4, anchor="n", text=f"+{hidden}", fill="#57606a",
+                                       font=("Segoe UI", 9), tags="rb"))
+        return items
 
     def _draw_tree(self):
         c = self.canvas
         c.delete("all")
+        self._drawn = {}
         root = self.tree.root
-        if root == self.tree.NULL:
-            c.create_text(20, 20, anchor="nw", text="Árvore vazia. Insira livros para visualizar.", font=("Segoe UI", 11))
+        if root is self.tree.NULL:
+            c.create_text(20, 20, anchor="nw", text="Árvore vazia. Insira livros para visualizar.",
+                          font=("Segoe UI", 11), tags="empty")
             return
 
-        coords = self._positions()
-        if not coords:
-            return
-
-        xs = [x for x, y in coords.values()]
-        ys = [y for x, y in coords.values()]
-        pad = 240
-        c.config(scrollregion=(min(xs)-pad, min(ys)-pad, max(xs)+pad, max(ys)+pad))
-
-        # Arestas
-        for n, (x, y) in coords.items():
-            for child in (n.left, n.right):
-                if child != self.tree.NULL and child in coords:
-                    cx, cy = coords[child]
-                    c.create_line(x, y, cx, cy, width=2, fill="#9aa4b2")
-
-        # Nós
-        for n, (x, y) in coords.items():
-            r = int(22 * self._scale)
-            fill = "#d43333" if n.color == "RED" else "#1f2328"
-            outline = "#8b0000" if n.color == "RED" else "#111417"
-            c.create_oval(x-r, y-r, x+r, y+r, fill=fill, outline=outline, width=2)
-            key_txt = n.key if isinstance(n.key, str) else str(n.key)
-            c.create_text(x, y, fill="#ffffff", text=key_txt[:7], font=("Segoe UI", max(9, int(10*self._scale)), "bold"))
+        self._update_scrollregion()
+        self._sync_canvas()
 
         # Legenda
-        c.create_rectangle(10, 10, 240, 70, fill="#ffffff", outline="#d0d7de")
-        c.create_oval(20, 20, 40, 40, fill="#d43333", outline="#8b0000", width=2)
-        c.create_text(50, 30, text="Vermelho", anchor="w")
-        c.create_oval(130, 20, 150, 40, fill="#1f2328", outline="#111417", width=2)
-        c.create_text(160, 30, text="Preto", anchor="w")
+        c.create_rectangle(10, 10, 240, 70, fill="#ffffff", outline="#d0d7de", tags="legend")
+        c.create_oval(20, 20, 40, 40, fill="#d43333", outline="#8b0000", width=2, tags="legend")
+        c.create_text(50, 30, text="Vermelho", anchor="w", tags="legend")
+        c.create_oval(130, 20, 150, 40, fill="#1f2328", outline="#111417", width=2, tags="legend")
+        c.create_text(160, 30, text="Preto", anchor="w", tags="legend")
 
     # ---------- Dados de exemplo ----------
     def _seed_examples(self):
@@ -551,15 +765,29 @@ class App:
             {"isbn":"978628","titulo":"Torto Arado","autor":"Itamar Vieira Jr.","ano":2019},
             {"isbn":"978651","titulo":"Quarto de Despejo","autor":"Carolina Maria de Jesus","ano":1960},
         ]
-        for l in exemplos:
-            self.tree.insert(l["isbn"], l)
-        self._refresh_list()
+        self.tree.bulk_load((l["isbn"], l) for l in exemplos)
+        if self.store is not None:
+            for l in exemplos:
+                self.store.insert(l["isbn"], l)
+        self._render_list()
         self._redraw()
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catálogo de livros com árvore rubro-negra")
+    parser.add_argument("--db", help="arquivo do acervo persistente (criado se não existir)")
+    parser.add_argument("--engine", choices=("rbtree", "btree"), default="rbtree",
+                        help="motor do catálogo (btree: sem a aba de visualização)")
+    args = parser.parse_args(argv)
+
+    engine = RedBlackTree
+    if args.engine == "btree":
+        engine = BTree
+    store = None
+    if args.db:
+        store = DiskCatalogue(args.db, key_codec=ISBN_CODEC)
     root = tk.Tk()
-    App(root)
+    App(root, store=store, engine=engine)
     root.mainloop()
 
 
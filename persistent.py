@@ -0,0 +1,230 @@
+"""RB-Tree persistente (imutável): cada alteração gera uma nova versão.
+
+``insert``/``delete`` não mexem na árvore: devolvem uma nova
+``PersistentRedBlackTree`` que copia apenas o caminho raiz→chave (O(log n)
+nós) e compartilha todo o resto com a versão anterior. Versões antigas
+continuam consultáveis pela mesma API (``search``, ``inorder``,
+``iter_items``, ``iter_range``) — basta guardar a referência:
+
+    ontem = acervo
+    acervo = acervo.insert("978...", livro)
+    ontem.search("978...")  # -> None
+
+O compartilhamento exige nós sem ``parent`` e sem o sentinela NULL
+compartilhado da RedBlackTree (ambos seriam reescritos a cada alteração):
+aqui a folha vazia é ``None`` e a travessia usa uma pilha. O rebalanceamento
+segue a formulação funcional de Okasaki (inserção) e Kahrs (remoção).
+"""
+from rbtree import RedBlackTree
+
+
+class _PNode:
+    """Nó imutável (por convenção: nunca é alterado depois de criado)."""
+    __slots__ = ("key", "data", "red", "left", "right")
+
+    def __init__(self, red, left, key, data, right):
+        self.red = red
+        self.left = left
+        self.key = key
+        self.data = data
+        self.right = right
+
+    @property
+    def color(self) -> str:
+        return "RED" if self.red else "BLACK"
+
+    def __repr__(self):
+        return f"_PNode(key={self.key!r}, color={self.color})"
+
+
+def _is_red(n) -> bool:
+    return n is not None and n.red
+
+
+def _blacken(n):
+    return _PNode(False, n.left, n.key, n.data, n.right) if _is_red(n) else n
+
+
+def _redden(n):
+    return _PNode(True, n.left, n.key, n.data, n.right)
+
+
+def _balance(a, k, d, b):
+    """Nó preto (k, d) sobre ``a`` e ``b``, desfazendo vermelho-vermelho logo abaixo."""
+    if _is_red(a) and _is_red(b):
+        return _PNode(True, _blacken(a), k, d, _blacken(b))
+    if _is_red(a):
+        if _is_red(a.left):
+            return _PNode(True, _blacken(a.left), a.key, a.data, _PNode(False, a.right, k, d, b))
+        if _is_red(a.right):
+            m = a.right
+            return _PNode(True, _PNode(False, a.left, a.key, a.data, m.left), m.key, m.data,
+                          _PNode(False, m.right, k, d, b))
+    elif _is_red(b):
+        if _is_red(b.right):
+            return _PNode(True, _PNode(False, a, k, d, b.left), b.key, b.data, _blacken(b.right))
+        if _is_red(b.left):
+            m = b.left
+            return _PNode(True, _PNode(False, a, k, d, m.left), m.key, m.data,
+                          _PNode(False, m.right, b.key, b.data, b.right))
+    return _PNode(False, a, k, d, b)
+
+
+def _insert(t, key, data):
+    if t is None:
+        return _PNode(True, None, key, data, None)
+    if key < t.key:
+        if t.red:
+            return _PNode(True, _insert(t.left, key, data), t.key, t.data, t.right)
+        return _balance(_insert(t.left, key, data), t.key, t.data, t.right)
+    if key > t.key:
+        if t.red:
+            return _PNode(True, t.left, t.key, t.data, _insert(t.right, key, data))
+        return _balance(t.left, t.key, t.data, _insert(t.right, key, data))
+    return _PNode(t.red, t.left, key, data, t.right)
+
+
+# Remoção (Kahrs): a subárvore de onde saiu um nó preto fica com altura
+# negra uma unidade menor; _balance_left/_balance_right compensam.
+def _balance_left(short, k, d, r):
+    if _is_red(short):
+        return _PNode(True, _blacken(short), k, d, r)
+    if not r.red:
+        return _balance(short, k, d, _redden(r))
+    m = r.left  # r vermelho: o filho esquerdo é preto
+    return _PNode(True, _PNode(False, short, k, d, m.left), m.key, m.data,
+                  _balance(m.right, r.key, r.data, _redden(r.right)))
+
+
+def _balance_right(l, k, d, short):
+    if _is_red(short):
+        return _PNode(True, l, k, d, _blacken(short))
+    if not l.red:
+        return _balance(_redden(l), k, d, short)
+    m = l.right
+    return _PNode(True, _balance(_redden(l.left), l.key, l.data, m.left), m.key, m.data,
+                  _PNode(False, m.right, k, d, short))
+
+
+def _join(a, b):
+    """Junta duas subárvores irmãs (todas as chaves de ``a`` < as de ``b``)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.red and b.red:
+        m = _join(a.right, b.left)
+        if _is_red(m):
+            return _PNode(True, _PNode(True, a.left, a.key, a.data, m.left), m.key, m.data,
+                          _PNode(True, m.right, b.key, b.data, b.right))
+        return _PNode(True, a.left, a.key, a.data, _PNode(True, m, b.key, b.data, b.right))
+    if not a.red and not b.red:
+        m = _join(a.right, b.left)
+        if _is_red(m):
+            return _PNode(True, _PNode(False, a.left, a.key, a.data, m.left), m.key, m.data,
+                          _PNode(False, m.right, b.key, b.data, b.right))
+        return _balance_left(a.left, a.key, a.data, _PNode(False, m, b.key, b.data, b.right))
+    if b.red:
+        return _PNode(True, _join(a, b.left), b.key, b.data, b.right)
+    return _PNode(True, a.left, a.key, a.data, _join(a.right, b))
+
+
+def _delete(t, key):
+    """Remove ``key`` (que precisa existir) de ``t``."""
+    if key < t.key:
+        if t.left.red:
+            return _PNode(True, _delete(t.left, key), t.key, t.data, t.right)
+        return _balance_left(_delete(t.left, key), t.key, t.data, t.right)
+    if key > t.key:
+        if t.right.red:
+            return _PNode(True, t.left, t.key, t.data, _delete(t.right, key))
+        return _balance_right(t.left, t.key, t.data, _delete(t.right, key))
+    return _join(t.left, t.right)
+
+
+class PersistentRedBlackTree:
+    """Versão imutável da RedBlackTree: ``insert``/``delete`` devolvem a nova versão."""
+    __slots__ = ("root", "_count")
+
+    def __init__(self, root=None, count=0):
+        self.root = root
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    @classmethod
+    def from_sorted(cls, items):
+        """Primeira versão em O(n) a partir de pares (chave, dados)."""
+        pairs = RedBlackTree._sorted_unique(items)
+        red_depth = len(pairs).bit_length() - 1
+
+        def build(lo, hi, depth):
+            if lo > hi:
+                return None
+            mid = (lo + hi) // 2
+            k, d = pairs[mid]
+            return _PNode(depth == red_depth, build(lo, mid - 1, depth + 1), k, d,
+                          build(mid + 1, hi, depth + 1))
+
+        root = build(0, len(pairs) - 1, 0)
+        return cls(_blacken(root), len(pairs))
+
+    def insert(self, key, data) -> "PersistentRedBlackTree":
+        """Nova versão com ``key`` inserida (ou com os dados atualizados)."""
+        key = str(key)
+        count = self._count + (self.search(key) is None)
+        return PersistentRedBlackTree(_blacken(_insert(self.root, key, data)), count)
+
+    def delete(self, key) -> "PersistentRedBlackTree":
+        """Nova versão sem ``key`` (a própria versão, se a chave não existe)."""
+        key = str(key)
+        if self.search(key) is None:
+            return self
+        return PersistentRedBlackTree(_blacken(_delete(self.root, key)), self._count - 1)
+
+    def search(self, key):
+        key = str(key)
+        x = self.root
+        while x is not None:
+            k = x.key
+            if key == k:
+                return x
+            x = x.left if key < k else x.right
+        return None
+
+    def inorder(self):
+        return list(self.iter_items())
+
+    def iter_items(self, reverse=False):
+        """Gera (chave, dados, cor) em ordem (ou em ordem inversa)."""
+        return self.iter_range(reverse=reverse)
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        """Gera os itens com lo <= chave <= hi (None = sem limite)."""
+        lo = None if lo is None else str(lo)
+        hi = None if hi is None else str(hi)
+        # pilha com o caminho até o próximo nó; subárvores fora da faixa
+        # nem são empilhadas
+        stack, x = [], self.root
+        while True:
+            while x is not None:
+                if reverse:
+                    if hi is not None and x.key > hi:
+                        x = x.left
+                        continue
+                    stack.append(x)
+                    x = x.right
+                else:
+                    if lo is not None and x.key < lo:
+                        x = x.right
+                        continue
+                    stack.append(x)
+                    x = x.left
+            if not stack:
+                return
+            x = stack.pop()
+            if (lo is not None and x.key < lo) if reverse else (hi is not None and x.key > hi):
+                return
+            yield x.key, x.data, x.color
+            x = x.left if reverse else x.right
@@ -0,0 +1,1330 @@
+"""Árvore rubro-negra do catálogo, sem dependência de interface gráfica.
+
+``RedBlackTree`` (inserção, remoção, busca, lotes, estatísticas de ordem,
+cache LRU, índices secundários, métricas e snapshot binário) e a interface
+comum dos motores (``CatalogueEngine``). O ``main.py`` monta a janela
+Tkinter sobre ela; ``bench.py``, ``server.py``, ``catalog_io.py`` e os
+demais módulos importam daqui e rodam sem Tk.
+"""
+import gc
+import marshal
+import operator
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice, zip_longest
+from time import perf_counter_ns
+
+from isbn import ISBN_CODEC
+
+# ===============================
+# Red-Black Tree (inserção, remoção, busca)
+# ===============================
+
+class _Node:
+    """Nó compacto da RB-Tree.
+
+    ``__slots__`` elimina o ``__dict__`` por instância e a cor fica num bool
+    (``red``), evitando comparações de string nos fix-ups. ``color`` continua
+    disponível ("RED"/"BLACK") para a GUI e para ``inorder``.
+    ``size`` (tamanho da subárvore) só é mantido com ``order_stats=True``.
+    Sem ``__eq__``: hash/igualdade por identidade (usado como chave de dict).
+    """
+    __slots__ = ("key", "data", "red", "left", "right", "parent", "size")
+
+    def __init__(self, key, data, red=True, left=None, right=None, parent=None, size=1):
+        self.key = key
+        self.data = data
+        self.red = red
+        self.left = left
+        self.right = right
+        self.parent = parent
+        self.size = size
+
+    @property
+    def color(self) -> str:
+        return "RED" if self.red else "BLACK"
+
+    @color.setter
+    def color(self, value: str):
+        self.red = value == "RED"
+
+    def __repr__(self):
+        return f"_Node(key={self.key!r}, color={self.color!r})"
+
+
+_SNAP_MAGIC = b"RBSNAP01"
+_SNAP_HEADER = struct.Struct("<8sBQ")  # magic, flags, nº de registros
+_SNAP_CHUNK = struct.Struct("<I")      # tamanho do bloco seguinte
+_SNAP_ZLIB = 1
+_SNAP_CODEC = 2  # chaves gravadas já codificadas (RedBlackTree com key_codec)
+_SNAP_RECORDS_PER_CHUNK = 4096
+
+
+class _SecondaryIndex:
+    """Índice ordenado sobre um campo dos dados (ver RedBlackTree.add_index)."""
+    __slots__ = ("extract", "encode", "tree")
+
+    def __init__(self, extract, encode):
+        self.extract = extract
+        self.encode = encode
+        self.tree = None
+
+    def composite(self, node):
+        value = self.extract(node.data)
+        if value is None:
+            return None
+        return f"{self.encode(value)}\0{node.key}"
+
+    def entries(self, nodes):
+        for node in nodes:
+            composite = self.composite(node)
+            if composite is not None:
+                yield composite, node
+
+
+def text_index_key(value) -> str:
+    """Codificação para índices de texto sem distinção de maiúsculas."""
+    return str(value).casefold()
+
+
+def year_index_key(value) -> str:
+    """Codificação de anos (inclusive negativos) com ordem numérica."""
+    return f"{int(value) + 1_000_000:07d}"
+
+
+def validate_book(isbn, titulo, autor=None, ano=None) -> dict:
+    """Normaliza os campos de um livro (como o formulário do App).
+
+    ISBN e título são obrigatórios; o ISBN precisa ser aceito por
+    ``ISBN_CODEC`` (mas é guardado como digitado); autor vazio vira "—";
+    ano, se informado, precisa ser inteiro. Levanta ValueError com a
+    mensagem para o usuário.
+    """
+    isbn = str(isbn or "").strip()
+    titulo = str(titulo or "").strip()
+    autor = str(autor or "").strip() or "—"
+    ano = str(ano if ano is not None else "").strip()
+    if not isbn or not titulo:
+        raise ValueError("Informe ao menos ISBN e Título.")
+    ISBN_CODEC.normalize(isbn)
+    try:
+        ano_int = int(ano) if ano else None
+    except ValueError:
+        raise ValueError("O campo Ano deve ser numérico.") from None
+    return {"isbn": isbn, "titulo": titulo, "autor": autor, "ano": ano_int}
+
+
+def add_book_indexes(tree):
+    """Índices do catálogo: título e autor (prefixo) e ano (faixa)."""
+    tree.add_index("titulo", lambda livro: livro.get("titulo"), text_index_key)
+    tree.add_index("autor", lambda livro: livro.get("autor"), text_index_key)
+    tree.add_index("ano", lambda livro: livro.get("ano"), year_index_key)
+
+
+class _LatencyHistogram:
+    """Histograma de latências em faixas de potências de 2 (nanossegundos)."""
+    __slots__ = ("counts", "total_ns")
+    _BUCKETS = 31  # faixa i: até 2**i ns (a última, 2**30 ns ~ 1 s, acumula o resto)
+
+    def __init__(self):
+        self.counts = [0] * self._BUCKETS
+        self.total_ns = 0
+
+    def record(self, ns: int):
+        self.counts[min(ns.bit_length(), self._BUCKETS - 1)] += 1
+        self.total_ns += ns
+
+    def quantile_ns(self, q: float) -> int:
+        """Limite superior da faixa que contém o quantil ``q``."""
+        target = q * sum(self.counts)
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= target:
+                return 1 << i
+        return 0
+
+
+class TreeMetrics:
+    """Contadores de uma RedBlackTree(metrics=True) (ver RedBlackTree.stats)."""
+
+    def __init__(self):
+        self.insert_cases = [0, 0, 0, 0]      # índices 1-3: casos do _insert_fixup
+        self.delete_cases = [0, 0, 0, 0, 0]   # índices 1-4: casos do _delete_fixup
+        self.searches = 0
+        self.comparisons = 0
+        self.max_depth = 0
+        self.latency = {}  # operação -> _LatencyHistogram
+
+    @property
+    def rotations(self) -> int:
+        # cada caso 2/3 da inserção e 1/3/4 da remoção faz exatamente uma rotação
+        ins, dele = self.insert_cases, self.delete_cases
+        return ins[2] + ins[3] + dele[1] + dele[3] + dele[4]
+
+
+@contextmanager
+def _gc_paused():
+    """Suspende o GC cíclico durante construções em massa.
+
+    Milhões de nós novos disparam coletas repetidas que varrem o heap inteiro;
+    os nós só formam ciclos com a própria árvore, então nada se perde.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class InvariantError(AssertionError):
+    """Estrutura interna inconsistente (ver RedBlackTree.validate)."""
+
+
+class CatalogueEngine(ABC):
+    """Interface dos motores do catálogo: mapa ordenado chave -> dados.
+
+    Implementada pela RedBlackTree e pela ``btree.BTree``; o App e as
+    ferramentas (catalog_io, server) usam só estes métodos. ``search`` e
+    ``select`` devolvem um objeto com ``key``, ``data`` e ``color``; os
+    iteradores geram (chave, dados, cor). Os construtores aceitam
+    ``order_stats`` e ``key_codec`` (ver RedBlackTree).
+    """
+
+    @classmethod
+    @abstractmethod
+    def from_sorted(cls, items, **kwargs):
+        """Motor novo com os pares (chave, dados), em tempo linear se ordenados."""
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    @abstractmethod
+    def insert(self, key, data) -> bool:
+        """Insere ou atualiza; True se a chave é nova."""
+
+    @abstractmethod
+    def delete(self, key) -> bool:
+        """Remove; True se a chave existia."""
+
+    @abstractmethod
+    def search(self, key):
+        """Item da chave (``key``/``data``/``color``) ou None."""
+
+    @abstractmethod
+    def search_many(self, keys):
+        ...
+
+    @abstractmethod
+    def insert_many(self, items):
+        ...
+
+    @abstractmethod
+    def delete_many(self, keys):
+        ...
+
+    @abstractmethod
+    def bulk_load(self, items):
+        ...
+
+    @abstractmethod
+    def iter_items(self, reverse=False):
+        ...
+
+    @abstractmethod
+    def iter_from(self, key, reverse=False):
+        ...
+
+    @abstractmethod
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        ...
+
+    @abstractmethod
+    def rank(self, key) -> int:
+        ...
+
+    @abstractmethod
+    def select(self, i: int):
+        ...
+
+    @abstractmethod
+    def count_range(self, lo=None, hi=None) -> int:
+        ...
+
+    @abstractmethod
+    def add_index(self, name: str, extract, encode=str):
+        ...
+
+    @abstractmethod
+    def find_prefix(self, name: str, prefix):
+        ...
+
+    @abstractmethod
+    def find_range(self, name: str, lo=None, hi=None):
+        ...
+
+    def inorder(self):
+        return list(self.iter_items())
+
+
+class RedBlackTree(CatalogueEngine):
+    # operações com histograma de latência quando metrics=True
+    _TIMED_OPS = ("search", "insert", "delete", "search_many", "insert_many", "delete_many", "bulk_load")
+
+    def __init__(self, order_stats: bool = False, cache_size: int = 0, metrics: bool = False,
+                 key_codec=None, debug: bool = False):
+        """``order_stats=True`` mantém o tamanho de cada subárvore, habilitando
+        ``rank``/``select``/``count_range`` em O(log n).
+        ``cache_size > 0`` põe um cache LRU (chave -> nó) na frente de ``search``.
+        ``metrics=True`` liga os contadores de ``stats()``/``metrics_text()``.
+        ``key_codec`` (ex.: ``isbn.ISBN_CODEC``) converte as chaves recebidas
+        com ``encode``; os nós guardam a chave codificada. Sem ele, ``str``.
+        ``debug=True`` roda ``validate()`` após cada operação que altera a
+        árvore (O(n) por operação: só para testes)."""
+        self.NULL = _Node(key=None, data=None, red=False, size=0)
+        self.NULL.left = self.NULL.right = self.NULL.parent = self.NULL
+        self.root = self.NULL
+        self._count = 0
+        self._order_stats = order_stats
+        self._cache = OrderedDict() if cache_size > 0 else None
+        self._cache_size = cache_size
+        self._cache_hits = self._cache_misses = 0
+        self._indexes = {}  # nome -> _SecondaryIndex (ver add_index)
+        self.key_codec = key_codec
+        self._key = str if key_codec is None else key_codec.encode
+        self._metrics = None
+        if metrics:
+            self._enable_metrics()
+        self._debug = debug
+        if debug:
+            self._enable_debug()
+
+    def __len__(self):
+        return self._count
+
+    # ---------- Utilidades ----------
+    def _transplant(self, u: _Node, v: _Node):
+        """Substitui o subárvore enraizado em u pelo de v (clássico de BST)."""
+        if u.parent is self.NULL:
+            self.root = v
+        elif u is u.parent.left:
+            u.parent.left = v
+        else:
+            u.parent.right = v
+        v.parent = u.parent
+
+    def _minimum(self, x: _Node):
+        while x.left is not self.NULL:
+            x = x.left
+        return x
+
+    def _maximum(self, x: _Node):
+        while x.right is not self.NULL:
+            x = x.right
+        return x
+
+    def _successor(self, x: _Node):
+        if x.right is not self.NULL:
+            return self._minimum(x.right)
+        y = x.parent
+        while y is not self.NULL and x is y.right:
+            x, y = y, y.parent
+        return y
+
+    def _predecessor(self, x: _Node):
+        if x.left is not self.NULL:
+            return self._maximum(x.left)
+        y = x.parent
+        while y is not self.NULL and x is y.left:
+            x, y = y, y.parent
+        return y
+
+    # ---------- Rotações ----------
+    def _left_rotate(self, x: _Node):
+        y = x.right
+        x.right = y.left
+        if y.left is not self.NULL:
+            y.left.parent = x
+        y.parent = x.parent
+        if x.parent is self.NULL:
+            self.root = y
+        elif x is x.parent.left:
+            x.parent.left = y
+        else:
+            x.parent.right = y
+        y.left = x
+        x.parent = y
+        if self._order_stats:
+            y.size = x.size
+            x.size = x.left.size + x.right.size + 1
+
+    def _right_rotate(self, x: _Node):
+        y = x.left
+        x.left = y.right
+        if y.right is not self.NULL:
+            y.right.parent = x
+        y.parent = x.parent
+        if x.parent is self.NULL:
+            self.root = y
+        elif x is x.parent.right:
+            x.parent.right = y
+        else:
+            x.parent.left = y
+        y.right = x
+        x.parent = y
+        if self._order_stats:
+            y.size = x.size
+            x.size = x.left.size + x.right.size + 1
+
+    # ---------- Inserção ----------
+    def insert(self, key: str, data: dict) -> bool:
+        """Insere ou atualiza. Retorna True se a chave é nova, False se só atualizou."""
+        # str() de um str devolve o próprio objeto: sem codec, a chave do nó e
+        # livro["isbn"] compartilham a mesma string, sem cópia
+        key = self._key(key)
+        NULL = self.NULL
+
+        y = NULL
+        x = self.root
+        while x is not NULL:
+            y = x
+            if key < x.key:
+                x = x.left
+            elif key > x.key:
+                x = x.right
+            else:
+                # chave já existe -> atualizar conteúdo e sair
+                self._replace_data(x, data)
+                return False
+        self._link_new(y, key, data)
+        return True
+
+    def _link_new(self, y: _Node, key: str, data):
+        """Pendura um nó novo sob ``y``, a folha onde a busca por key terminou."""
+        NULL = self.NULL
+        z = _Node(key, data, True, NULL, NULL, y)
+        if y is NULL:
+            self.root = z
+        elif key < y.key:
+            y.left = z
+        else:
+            y.right = z
+
+        self._count += 1
+        if self._order_stats:
+            while y is not NULL:
+                y.size += 1
+                y = y.parent
+        self._insert_fixup(z)
+        if self._indexes:
+            self._index_add(z)
+        return z
+
+    def _replace_data(self, node: _Node, data):
+        if self._indexes:
+            self._index_remove(node)
+            node.data = data
+            self._index_add(node)
+        else:
+            node.data = data
+
+    def _insert_fixup(self, z: _Node):
+        # Casos 1,2,3 e versões espelhadas (conforme slide de referência)
+        cases = self._metrics.insert_cases if self._metrics is not None else None
+        while z.parent.red:
+            if z.parent is z.parent.parent.left:
+                y = z.parent.parent.right  # tio
+                if y.red:
+                    # Caso 1: tio vermelho -> recoloração e sobe
+                    if cases is not None:
+                        cases[1] += 1
+                    z.parent.red = False
+                    y.red = False
+                    z.parent.parent.red = True
+                    z = z.parent.parent
+                else:
+                    if z is z.parent.right:
+                        # Caso 2: triângulo (dir) -> rot. esquerda para virar caso 3
+                        if cases is not None:
+                            cases[2] += 1
+                        z = z.parent
+                        self._left_rotate(z)
+                    # Caso 3: linha (esq) -> recoloração + rot. direita
+                    if cases is not None:
+                        cases[3] += 1
+                    z.parent.red = False
+                    z.parent.parent.red = True
+                    self._right_rotate(z.parent.parent)
+            else:
+                # espelho: troca left<->right
+                y = z.parent.parent.left
+                if y.red:
+                    if cases is not None:
+                        cases[1] += 1
+                    z.parent.red = False
+                    y.red = False
+                    z.parent.parent.red = True
+                    z = z.parent.parent
+                else:
+                    if z is z.parent.left:
+                        if cases is not None:
+                            cases[2] += 1
+                        z = z.parent
+                        self._right_rotate(z)
+                    if cases is not None:
+                        cases[3] += 1
+                    z.parent.red = False
+                    z.parent.parent.red = True
+                    self._left_rotate(z.parent.parent)
+        self.root.red = False
+
+    # ---------- Remoção ----------
+    def delete(self, key: str) -> bool:
+        """Remove a chave se existir. Retorna True se removeu, False se não encontrou."""
+        z = self._find_node(key)
+        if z is None:
+            return False
+        self._delete_node(z)
+        return True
+
+    def _delete_node(self, z: _Node):
+        if self._indexes:
+            self._index_remove(z)
+        if self._cache is not None:
+            self._cache.pop(z.key, None)
+        if self._order_stats:
+            # o nó que sai fisicamente é z (<= 1 filho) ou o sucessor de z
+            gone = z if z.left is self.NULL or z.right is self.NULL else self._minimum(z.right)
+            p = gone.parent
+            while p is not self.NULL:
+                p.size -= 1
+                p = p.parent
+
+        y = z
+        y_original_red = y.red
+        if z.left is self.NULL:
+            x = z.right
+            self._transplant(z, z.right)
+        elif z.right is self.NULL:
+            x = z.left
+            self._transplant(z, z.left)
+        else:
+            # sucessor
+            y = self._minimum(z.right)
+            y_original_red = y.red
+            x = y.right
+            if y.parent is z:
+                x.parent = y
+            else:
+                self._transplant(y, y.right)
+                y.right = z.right
+                y.right.parent = y
+            self._transplant(z, y)
+            y.left = z.left
+            y.left.parent = y
+            y.red = z.red
+            y.size = z.size
+
+        self._count -= 1
+        if not y_original_red:
+            self._delete_fixup(x)
+
+    def _delete_fixup(self, x: _Node):
+        # Trata "duplo-preto" em x até restaurar as propriedades
+        cases = self._metrics.delete_cases if self._metrics is not None else None
+        while x is not self.root and not x.red:
+            if x is x.parent.left:
+                w = x.parent.right  # irmão
+                if w.red:
+                    # Caso 1: irmão vermelho
+                    if cases is not None:
+                        cases[1] += 1
+                    w.red = False
+                    x.parent.red = True
+                    self._left_rotate(x.parent)
+                    w = x.parent.right
+                if not w.left.red and not w.right.red:
+                    # Caso 2: irmão preto com dois filhos pretos
+                    if cases is not None:
+                        cases[2] += 1
+                    w.red = True
+                    x = x.parent
+                else:
+                    if not w.right.red:
+                        # Caso 3: irmão preto, filho esquerdo vermelho, direito preto
+                        if cases is not None:
+                            cases[3] += 1
+                        w.left.red = False
+                        w.red = True
+                        self._right_rotate(w)
+                        w = x.parent.right
+                    # Caso 4: irmão preto, filho direito vermelho
+                    if cases is not None:
+                        cases[4] += 1
+                    w.red = x.parent.red
+                    x.parent.red = False
+                    w.right.red = False
+                    self._left_rotate(x.parent)
+                    x = self.root
+            else:
+                # espelho: troca left<->right
+                w = x.parent.left
+                if w.red:
+                    if cases is not None:
+                        cases[1] += 1
+                    w.red = False
+                    x.parent.red = True
+                    self._right_rotate(x.parent)
+                    w = x.parent.left
+                if not w.right.red and not w.left.red:
+                    if cases is not None:
+                        cases[2] += 1
+                    w.red = True
+                    x = x.parent
+                else:
+                    if not w.left.red:
+                        if cases is not None:
+                            cases[3] += 1
+                        w.right.red = False
+                        w.red = True
+                        self._left_rotate(w)
+                        w = x.parent.left
+                    if cases is not None:
+                        cases[4] += 1
+                    w.red = x.parent.red
+                    x.parent.red = False
+                    w.left.red = False
+                    self._right_rotate(x.parent)
+                    x = self.root
+
+        x.red = False
+
+    # ---------- Carga em lote ----------
+    @classmethod
+    def from_sorted(cls, items, **kwargs):
+        """Constrói a árvore em O(n) a partir de pares (chave, dados).
+
+        Se a entrada não vier ordenada, é ordenada antes (O(n log n)).
+        Chaves repetidas: vale a última ocorrência, como no ``insert``.
+        ``kwargs`` vão para o construtor (ex.: ``order_stats=True``).
+        """
+        tree = cls(**kwargs)
+        with _gc_paused():
+            tree._link_balanced([_Node(k, d) for k, d in cls._sorted_unique(items, tree._key)])
+        if tree._debug:
+            tree.validate()
+        return tree
+
+    def bulk_load(self, items):
+        """Mescla um lote de pares (chave, dados) na árvore.
+
+        Lotes pequenos em relação à árvore usam ``insert``; os grandes são
+        intercalados com a travessia em-ordem e a árvore é reconstruída em
+        O(n + m), sem rotações. Os nós existentes são reaproveitados.
+        """
+        with _gc_paused():
+            batch = self._sorted_unique(items, self._key)
+            if not batch:
+                return
+            if not self._prefer_rebuild(len(batch), self._count + len(batch), 7):
+                for k, d in batch:
+                    self.insert(k, d)
+                return
+
+            self._merge_sorted(batch)
+
+    def _prefer_rebuild(self, m: int, total: int, levels_per_node: int) -> bool:
+        """Religar ``total`` nós (O(n + m)) sai mais barato que m descidas de
+        O(log n) com fix-up? ``levels_per_node``: custo medido (CPython) de
+        religar um nó, em níveis de descida — ~7 intercalando um lote novo,
+        ~4 só filtrando nós removidos."""
+        return m * total.bit_length() >= levels_per_node * total
+
+    def _merge_sorted(self, batch):
+        """Intercala ``batch`` (ordenado, sem repetição) com os nós atuais e
+        religa tudo em O(n + m). Devolve, por item do lote, se a chave era nova."""
+        n, m = self._count, len(batch)
+        merged, added, fresh = [], [], []
+        old = list(self._iter_nodes(self._minimum(self.root)))
+        i = j = 0
+        while i < n and j < m:
+            node, (k, d) = old[i], batch[j]
+            if node.key < k:
+                merged.append(node)
+                i += 1
+            elif node.key > k:
+                node = _Node(k, d)
+                merged.append(node)
+                fresh.append(node)
+                added.append(True)
+                j += 1
+            else:
+                self._replace_data(node, d)
+                merged.append(node)
+                added.append(False)
+                i += 1
+                j += 1
+        tail = [_Node(k, d) for k, d in batch[j:]]
+        merged.extend(old[i:])
+        merged.extend(tail)
+        added.extend([True] * len(tail))
+        self._link_balanced(merged)
+        if self._indexes:
+            for node in fresh + tail:
+                self._index_add(node)
+        return added
+
+    @staticmethod
+    def _sorted_unique(items, key=str):
+        pairs = [(key(k), d) for k, d in items]
+        keys = [k for k, _ in pairs]
+        if all(map(operator.lt, keys, keys[1:])):
+            return pairs
+        pairs.sort(key=lambda p: p[0])  # estável: duplicados mantêm a ordem de chegada
+        unique = []
+        for k, d in pairs:
+            if unique and unique[-1][0] == k:
+                unique[-1] = (k, d)
+            else:
+                unique.append((k, d))
+        return unique
+
+    def _link_balanced(self, nodes):
+        """Liga ``nodes`` (já em ordem) numa árvore de altura mínima.
+
+        Divisão pelo meio: todas as folhas ficam nos dois últimos níveis.
+        Pintar de vermelho apenas o nível mais profundo deixa toda
+        raiz→NULL com a mesma quantidade de nós pretos.
+        """
+        NULL = self.NULL
+        red_depth = len(nodes).bit_length() - 1
+
+        def build(lo, hi, depth, parent):
+            if lo > hi:
+                return NULL
+            mid = (lo + hi) // 2
+            n = nodes[mid]
+            n.parent = parent
+            n.red = depth == red_depth
+            n.size = hi - lo + 1
+            n.left = build(lo, mid - 1, depth + 1, n)
+            n.right = build(mid + 1, hi, depth + 1, n)
+            return n
+
+        self.root = build(0, len(nodes) - 1, 0, NULL)
+        self.root.red = False
+        self._count = len(nodes)
+
+    # ---------- Operações em lote ----------
+    # Lotes esparsos (menos de uma chave a cada 32 nós) não têm o que
+    # compartilhar: cada chave desce da raiz como no laço de chamadas, e
+    # inserção/remoção usam o próprio insert/delete. Lotes mais densos são
+    # percorridos em ordem com uma busca "dedo": cada chave parte do nó da
+    # anterior e sobe pelos pais só até a subárvore que a contém, em vez de
+    # descer da raiz — O(log d) para chaves a distância d. Lotes que são uma
+    # fração grande da árvore religam tudo em O(n + m) (_prefer_rebuild).
+    def _dense(self, m: int) -> bool:
+        return m * 32 >= self._count
+
+    def _finger_order(self, keys):
+        """Índices de ``keys`` em ordem crescente (estável: repetidas na ordem de chegada)."""
+        return sorted(range(len(keys)), key=keys.__getitem__)
+
+    def _find_many(self, keys):
+        """Nó (ou None) de cada chave de ``keys`` (já codificadas), na mesma ordem."""
+        NULL = self.NULL
+        out = [None] * len(keys)
+        if not self._dense(len(keys)):
+            root = self.root
+            for i, key in enumerate(keys):
+                x = root
+                while x is not NULL:
+                    # mesma ordem de comparações do insert: a igualdade,
+                    # rara no caminho, é testada por último
+                    k = x.key
+                    if key < k:
+                        x = x.left
+                    elif key > k:
+                        x = x.right
+                    else:
+                        out[i] = x
+                        break
+            return out
+
+        order = self._finger_order(keys)
+        for i, node in zip(order, self._finger([keys[i] for i in order])):
+            out[i] = node
+        return out
+
+    def _finger(self, ordered):
+        """Nó (ou None) de cada chave de ``ordered`` (crescente), por busca dedo."""
+        NULL = self.NULL
+        out = []
+        x = self.root  # dedo: último nó visitado, com chave <= a da vez
+        for key in ordered:
+            # sobe enquanto a subárvore de x acaba antes de key
+            q = x.parent
+            while q is not NULL and (x is q.right or key >= q.key):
+                x, q = q, q.parent
+            y, found = x, None
+            while y is not NULL:
+                k = y.key
+                if key < k:
+                    x, y = y, y.left
+                elif key > k:
+                    x, y = y, y.right
+                else:
+                    found = x = y
+                    break
+            out.append(found)
+        return out
+
+    def search_many(self, keys):
+        """Busca várias chaves; devolve, na ordem de entrada, o nó ou None."""
+        return self._find_many(list(map(self._key, keys)))
+
+    def insert_many(self, items):
+        """Insere/atualiza pares (chave, dados); devolve, na ordem de entrada,
+        True para cada chave nova (repetidas no lote: só a primeira)."""
+        items = [(self._key(k), d) for k, d in items]
+        if not self._dense(len(items)):
+            return [self.insert(k, d) for k, d in items]
+        if items and self._prefer_rebuild(len(items), self._count + len(items), 7):
+            with _gc_paused():
+                batch = self._sorted_unique(items, self._key)
+                added = dict(zip((k for k, _ in batch), self._merge_sorted(batch)))
+            out = []
+            for key, _ in items:
+                out.append(added[key])
+                added[key] = False
+            return out
+
+        # em ordem, com dedo: os nós não trocam de chave nas rotações do
+        # fix-up e os ponteiros de pai continuam certos, então o nó da chave
+        # anterior serve de ponto de partida
+        NULL = self.NULL
+        keys = [k for k, _ in items]
+        out = [False] * len(items)
+        x = self.root
+        for i in self._finger_order(keys):
+            key, data = items[i]
+            q = x.parent
+            while q is not NULL and (x is q.right or key >= q.key):
+                x, q = q, q.parent
+            y = NULL
+            while x is not NULL:
+                k = x.key
+                if key < k:
+                    y, x = x, x.left
+                elif key > k:
+                    y, x = x, x.right
+                else:
+                    break
+            if x is NULL:
+                x = self._link_new(y, key, data)
+                out[i] = True
+            else:
+                self._replace_data(x, data)
+        return out
+
+    def delete_many(self, keys):
+        """Remove várias chaves; devolve, na ordem de entrada, True para cada
+        chave removida (repetidas no lote: só a primeira)."""
+        keys = list(map(self._key, keys))
+        if not self._dense(len(keys)):
+            return [self.delete(k) for k in keys]
+        gone = set(keys)
+        if gone and self._prefer_rebuild(len(gone), self._count, 4):
+            kept, removed = [], set()
+            for n in self._iter_nodes(self._minimum(self.root)):
+                if n.key in gone:
+                    removed.add(n.key)
+                    if self._indexes:
+                        self._index_remove(n)
+                    if self._cache is not None:
+                        self._cache.pop(n.key, None)
+                else:
+                    kept.append(n)
+            if removed:
+                self._link_balanced(kept)
+            out = []
+            for key in keys:
+                out.append(key in removed)
+                removed.discard(key)
+            return out
+
+        # acha tudo antes de remover (o dedo não pode parar num nó removido);
+        # os nós continuam válidos entre remoções (o sucessor só muda de
+        # lugar) e remover em ordem mantém os caminhos vizinhos no cache
+        order = self._finger_order(keys)
+        out = [False] * len(keys)
+        last = None
+        for i, z in zip(order, self._finger([keys[i] for i in order])):
+            if z is not None and z is not last:  # repetidas ficam vizinhas
+                self._delete_node(z)
+                out[i] = True
+            last = z
+        return out
+
+    # ---------- Snapshot binário ----------
+    # Fluxo ordenado de pares (chave, dados) em blocos de até 4096 registros,
+    # cada bloco serializado com marshal (C, não executa código ao carregar)
+    # e opcionalmente comprimido com zlib. As cores não são gravadas: o
+    # load reconstrói a forma balanceada em O(n) e recalcula as cores.
+    def save(self, path: str, compress: bool = False):
+        """Grava um snapshot da árvore em ``path``."""
+        with open(path, "wb") as f:
+            flags = (_SNAP_ZLIB if compress else 0) | (_SNAP_CODEC if self.key_codec is not None else 0)
+            f.write(_SNAP_HEADER.pack(_SNAP_MAGIC, flags, self._count))
+            items = ((n.key, n.data) for n in self._iter_nodes(self._minimum(self.root)))
+            while True:
+                chunk = list(islice(items, _SNAP_RECORDS_PER_CHUNK))
+                if not chunk:
+                    break
+                blob = marshal.dumps(chunk, 4)
+                if compress:
+                    blob = zlib.compress(blob, 1)
+                f.write(_SNAP_CHUNK.pack(len(blob)))
+                f.write(blob)
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        """Lê um snapshot gravado por ``save`` (``kwargs`` vão para o construtor)."""
+        with open(path, "rb") as f:
+            magic, flags, count = _SNAP_HEADER.unpack(f.read(_SNAP_HEADER.size))
+            if magic != _SNAP_MAGIC:
+                raise ValueError(f"{path}: não é um snapshot RBSNAP")
+            if flags & _SNAP_CODEC and kwargs.get("key_codec") is None:
+                raise ValueError(f"{path}: chaves codificadas; use load(..., key_codec=...)")
+            items = []
+            with _gc_paused():
+                while True:
+                    head = f.read(_SNAP_CHUNK.size)
+                    if not head:
+                        break
+                    blob = f.read(_SNAP_CHUNK.unpack(head)[0])
+                    if flags & _SNAP_ZLIB:
+                        blob = zlib.decompress(blob)
+                    items.extend(marshal.loads(blob))
+        if len(items) != count:
+            raise ValueError(f"{path}: snapshot truncado ({len(items)} de {count} registros)")
+        return cls.from_sorted(items, **kwargs)
+
+    # ---------- Busca/Travessias ----------
+    def _find_node(self, key: str):
+        key = self._key(key)
+        NULL = self.NULL
+        x = self.root
+        while x is not NULL:
+            k = x.key
+            if key == k:
+                return x
+            x = x.left if key < k else x.right
+        return None
+
+    # busca das consultas; com metrics=True a instância a troca pela contada,
+    # enquanto buscas internas (delete, validate) seguem em _find_node
+    _lookup = _find_node
+
+    def search(self, key: str):
+        cache = self._cache
+        if cache is None:
+            return self._lookup(key)
+        key = self._key(key)
+        node = cache.get(key)
+        if node is not None:
+            cache.move_to_end(key)
+            self._cache_hits += 1
+            return node
+        self._cache_misses += 1
+        node = self._lookup(key)
+        if node is not None:
+            cache[key] = node
+            if len(cache) > self._cache_size:
+                cache.popitem(last=False)
+        return node
+
+    # ---------- Cache LRU de busca ----------
+    # Guarda o nó, não os dados: o nó de uma chave é o mesmo até ela ser
+    # removida (rotações e a troca pelo sucessor só mudam ponteiros), e
+    # atualizar a chave reescreve node.data no lugar. Basta então descartar
+    # a entrada quando o nó sai da árvore. Ausências não são guardadas.
+    def cache_info(self) -> dict:
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "size": len(self._cache) if self._cache is not None else 0,
+            "maxsize": self._cache_size,
+        }
+
+    def cache_clear(self):
+        if self._cache is not None:
+            self._cache.clear()
+        self._cache_hits = self._cache_misses = 0
+
+    # ---------- Métricas (metrics=True) ----------
+    # Desligadas, custam um teste de None por passo de fix-up: busca,
+    # inserção e remoção são os métodos da classe, sem instrumentação. Ligadas,
+    # a instância ganha versões próprias (atributos de instância têm
+    # precedência) que contam comparações e medem a latência.
+    def _enable_metrics(self):
+        metrics = self._metrics = TreeMetrics()
+        self._lookup = self._find_node_counted
+        for name in self._TIMED_OPS:
+            hist = metrics.latency[name] = _LatencyHistogram()
+            setattr(self, name, self._timed(getattr(self, name), hist.record))
+
+    @staticmethod
+    def _timed(fn, record):
+        def timed(*args, **kwargs):
+            t0 = perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(perf_counter_ns() - t0)
+        return timed
+
+    def _find_node_counted(self, key: str):
+        key = self._key(key)
+        NULL = self.NULL
+        x = self.root
+        depth = 0
+        while x is not NULL:
+            depth += 1
+            k = x.key
+            if key == k:
+                break
+            x = x.left if key < k else x.right
+        m = self._metrics
+        m.searches += 1
+        m.comparisons += depth
+        if depth > m.max_depth:
+            m.max_depth = depth
+        return x if x is not NULL else None
+
+    def black_height(self) -> int:
+        """Nós pretos de qualquer caminho raiz -> folha (O(log n))."""
+        h, x = 0, self.root
+        while x is not self.NULL:
+            h += not x.red
+            x = x.left
+        return h
+
+    def height(self) -> int:
+        """Altura em nós (O(n): percorre a árvore inteira)."""
+        best, stack = 0, [(self.root, 1)] if self.root is not self.NULL else []
+        while stack:
+            x, depth = stack.pop()
+            if depth > best:
+                best = depth
+            for child in (x.left, x.right):
+                if child is not self.NULL:
+                    stack.append((child, depth + 1))
+        return best
+
+    def stats(self, height: bool = False) -> dict:
+        """Retrato das métricas. ``height=True`` inclui a altura exata (O(n))."""
+        out = {"size": self._count, "black_height": self.black_height()}
+        if height:
+            out["height"] = self.height()
+        m = self._metrics
+        if m is None:
+            return out
+        out.update({
+            "rotations": m.rotations,
+            "insert_fixup_cases": {f"case{i}": m.insert_cases[i] for i in (1, 2, 3)},
+            "delete_fixup_cases": {f"case{i}": m.delete_cases[i] for i in (1, 2, 3, 4)},
+            "searches": m.searches,
+            "comparisons": m.comparisons,
+            "comparisons_per_search": m.comparisons / m.searches if m.searches else 0.0,
+            "max_search_depth": m.max_depth,
+            "latency_us": {
+                op: {
+                    "count": sum(h.counts),
+                    "mean": h.total_ns / sum(h.counts) / 1e3,
+                    "p50": h.quantile_ns(0.50) / 1e3,
+                    "p99": h.quantile_ns(0.99) / 1e3,
+                }
+                for op, h in m.latency.items() if h.total_ns
+            },
+        })
+        return out
+
+    def metrics_text(self, prefix: str = "rbtree") -> str:
+        """Métricas no formato de texto do Prometheus."""
+        lines = [
+            f"# TYPE {prefix}_size gauge",
+            f"{prefix}_size {self._count}",
+            f"# TYPE {prefix}_black_height gauge",
+            f"{prefix}_black_height {self.black_height()}",
+        ]
+        m = self._metrics
+        if m is None:
+            return "\n".join(lines) + "\n"
+        lines.append(f"# TYPE {prefix}_fixup_cases_total counter")
+        lines += [f'{prefix}_fixup_cases_total{{op="insert",case="{i}"}} {m.insert_cases[i]}' for i in (1, 2, 3)]
+        lines += [f'{prefix}_fixup_cases_total{{op="delete",case="{i}"}} {m.delete_cases[i]}' for i in (1, 2, 3, 4)]
+        lines += [
+            f"# TYPE {prefix}_rotations_total counter",
+            f"{prefix}_rotations_total {m.rotations}",
+            f"# TYPE {prefix}_searches_total counter",
+            f"{prefix}_searches_total {m.searches}",
+            f"# TYPE {prefix}_search_comparisons_total counter",
+            f"{prefix}_search_comparisons_total {m.comparisons}",
+            f"# TYPE {prefix}_search_max_depth gauge",
+            f"{prefix}_search_max_depth {m.max_depth}",
+            f"# TYPE {prefix}_op_latency_seconds histogram",
+        ]
+        for op, h in m.latency.items():
+            # todas as faixas, acumuladas, mesmo as vazias: o formato exige o
+            # mesmo conjunto de "le" em toda exposição
+            cumulative = 0
+            for i, c in enumerate(h.counts[:-1]):  # a última faixa fica só no +Inf
+                cumulative += c
+                lines.append(f'{prefix}_op_latency_seconds_bucket{{op="{op}",le="{(1 << i) / 1e9:g}"}} {cumulative}')
+            cumulative += h.counts[-1]
+            lines += [
+                f'{prefix}_op_latency_seconds_bucket{{op="{op}",le="+Inf"}} {cumulative}',
+                f'{prefix}_op_latency_seconds_sum{{op="{op}"}} {h.total_ns / 1e9:g}',
+                f'{prefix}_op_latency_seconds_count{{op="{op}"}} {cumulative}',
+            ]
+        return "\n".join(lines) + "\n"
+
+    # ---------- Verificação dos invariantes ----------
+    # Para testes e para o modo debug: qualquer otimização do fix-up ou das
+    # rotações deve manter validate() passando (ver stress.py).
+    _MUTATING_OPS = ("insert", "delete", "insert_many", "delete_many", "bulk_load")
+
+    def _enable_debug(self):
+        # como as métricas: versões de instância, sem custo quando desligado
+        for name in self._MUTATING_OPS:
+            setattr(self, name, self._validated(getattr(self, name)))
+
+    def _validated(self, fn):
+        def validated(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            self.validate()
+            return result
+        return validated
+
+    def validate(self):
+        """Confere todos os invariantes em O(n); levanta InvariantError no primeiro violado.
+
+        Raiz e NULL pretos, nenhum vermelho com filho vermelho, mesma altura
+        negra em todos os caminhos, ``parent`` coerente, chaves em ordem
+        estrita, ``size`` (com order_stats) e ``len`` corretos, cache
+        apontando para nós da árvore e índices secundários em dia.
+        """
+        NULL, root = self.NULL, self.root
+        if NULL.red or NULL.size:
+            raise InvariantError("sentinela NULL alterado (vermelho ou size != 0)")
+        if root.red:
+            raise InvariantError(f"raiz {root.key!r} vermelha")
+        if root is not NULL and root.parent is not NULL:
+            raise InvariantError(f"raiz {root.key!r} com parent")
+
+        count, black_height, prev = 0, None, None
+        # pilha de (nó, nº de pretos da raiz até ele, inclusive): em-ordem
+        # iterativo, para não depender do limite de recursão
+        stack, x, blacks = [], root, 0
+        while stack or x is not NULL:
+            while x is not NULL:
+                blacks += not x.red
+                for child in (x.left, x.right):
+                    if child is not NULL:
+                        if child.parent is not x:
+                            raise InvariantError(f"parent de {child.key!r} não aponta para {x.key!r}")
+                        if x.red and child.red:
+                            raise InvariantError(f"vermelho {x.key!r} com filho vermelho {child.key!r}")
+                    elif black_height is None:
+                        black_height = blacks
+                    elif blacks != black_height:
+                        raise InvariantError(f"altura negra {blacks} sob {x.key!r} (esperado {black_height})")
+                if self._order_stats and x.size != x.left.size + x.right.size + 1:
+                    raise InvariantError(f"size de {x.key!r} é {x.size}, esperado {x.left.size + x.right.size + 1}")
+                stack.append((x, blacks))
+                x = x.left
+            x, blacks = stack.pop()
+            if prev is not None and not prev.key < x.key:
+                raise InvariantError(f"chaves fora de ordem: {prev.key!r} antes de {x.key!r}")
+            prev = x
+            count += 1
+            x = x.right
+        if count != self._count:
+            raise InvariantError(f"len() = {self._count}, mas a árvore tem {count} nós")
+
+        if self._cache is not None:
+            for key, node in self._cache.items():
+                if node.key != key or self._find_node(key) is not node:
+                    raise InvariantError(f"cache com nó velho para {key!r}")
+        for name, index in self._indexes.items():
+            index.tree.validate()
+            expected = sorted(index.entries(self._iter_nodes(self._minimum(root))), key=lambda e: e[0])
+            actual = ((k, n) for k, n, _ in index.tree.iter_items())
+            for want, got in zip_longest(expected, actual):
+                if want is None or got is None or want[0] != got[0] or want[1] is not got[1]:
+                    raise InvariantError(f"índice {name!r} divergente em {(want or got)[0]!r}")
+
+    # ---------- Estatísticas de ordem (requer order_stats=True) ----------
+    def _require_order_stats(self):
+        if not self._order_stats:
+            raise RuntimeError("operação requer RedBlackTree(order_stats=True)")
+
+    def _count_below(self, key, inclusive=False):
+        """Quantidade de chaves < key (ou <= key se ``inclusive``)."""
+        r, x = 0, self.root
+        while x is not self.NULL:
+            if x.key < key or (inclusive and x.key == key):
+                r += x.left.size + 1
+                x = x.right
+            else:
+                x = x.left
+        return r
+
+    def rank(self, key) -> int:
+        """Posição (0-based) que ``key`` ocupa/ocuparia: nº de chaves menores."""
+        self._require_order_stats()
+        return self._count_below(self._key(key))
+
+    def select(self, i: int) -> _Node:
+        """Nó na posição ``i`` (0-based) da ordem; aceita índice negativo."""
+        self._require_order_stats()
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("posição fora da árvore")
+        x = self.root
+        while True:
+            left = x.left.size
+            if i < left:
+                x = x.left
+            elif i == left:
+                return x
+            else:
+                i -= left + 1
+                x = x.right
+
+    def count_range(self, lo=None, hi=None) -> int:
+        """Quantidade de chaves com lo <= chave <= hi (None = sem limite)."""
+        self._require_order_stats()
+        upper = self._count if hi is None else self._count_below(self._key(hi), inclusive=True)
+        lower = 0 if lo is None else self._count_below(self._key(lo))
+        return max(0, upper - lower)
+
+    # ---------- Índices secundários ----------
+    # Cada índice é outra RedBlackTree com chave composta
+    # "<valor codificado>\0<chave primária>" (única mesmo com valores
+    # repetidos) e, como dado, o próprio nó primário. Consultas por prefixo
+    # ou faixa custam O(log n + k), sem passar pela árvore principal.
+    def add_index(self, name: str, extract, encode=str):
+        """Cria (ou recria) o índice ``name``.
+
+        ``extract(dados)`` devolve o valor indexado (None = não indexar);
+        ``encode(valor)`` o converte numa string cuja ordem é a desejada
+        (também aplicado aos argumentos das consultas).
+        """
+        index = _SecondaryIndex(extract, encode)
+        index.tree = RedBlackTree.from_sorted(
+            index.entries(n for n in self._iter_nodes(self._minimum(self.root)))
+        )
+        self._indexes[name] = index
+
+    def _index_add(self, node: _Node):
+        for index in self._indexes.values():
+            composite = index.composite(node)
+            if composite is not None:
+                index.tree.insert(composite, node)
+
+    def _index_remove(self, node: _Node):
+        for index in self._indexes.values():
+            composite = index.composite(node)
+            if composite is not None:
+                index.tree.delete(composite)
+
+    def find_prefix(self, name: str, prefix):
+        """Gera (chave, dados, cor) dos itens cujo valor indexado começa com ``prefix``."""
+        index = self._indexes[name]
+        prefix = index.encode(prefix)
+        for composite, node, _ in index.tree.iter_from(prefix):
+            if not composite.startswith(prefix):
+                return
+            yield node.key, node.data, node.color
+
+    def find_range(self, name: str, lo=None, hi=None):
+        """Gera (chave, dados, cor) dos itens com lo <= valor indexado <= hi."""
+        index = self._indexes[name]
+        lo = None if lo is None else index.encode(lo)
+        # "\x01" fica acima de qualquer "<hi>\0<chave>"
+        hi = None if hi is None else index.encode(hi) + "\x01"
+        for _, node, _ in index.tree.iter_range(lo, hi):
+            yield node.key, node.data, node.color
+
+    # ---------- Iteradores (sem recursão, via ponteiros para o pai) ----------
+    # Percorrem a árvore sob demanda: quem consome pode parar a qualquer
+    # momento sem materializar o catálogo. Não modifique a árvore durante a
+    # iteração.
+    def _lower_bound(self, key):
+        """Primeiro nó com chave >= key (ou NULL)."""
+        x, best = self.root, self.NULL
+        while x is not self.NULL:
+            if x.key < key:
+                x = x.right
+            else:
+                best, x = x, x.left
+        return best
+
+    def _floor(self, key):
+        """Último nó com chave <= key (ou NULL)."""
+        x, best = self.root, self.NULL
+        while x is not self.NULL:
+            if x.key > key:
+                x = x.left
+            else:
+                best, x = x, x.right
+        return best
+
+    def _iter_nodes(self, x: _Node, reverse=False):
+        step = self._predecessor if reverse else self._successor
+        while x is not self.NULL:
+            yield x
+            x = step(x)
+
+    def iter_items(self, reverse=False):
+        """Gera (chave, dados, cor) em ordem (ou em ordem inversa)."""
+        if self.root is self.NULL:
+            return
+        start = self._maximum(self.root) if reverse else self._minimum(self.root)
+        for n in self._iter_nodes(start, reverse):
+            yield n.key, n.data, n.color
+
+    def iter_from(self, key, reverse=False):
+        """Gera os itens a partir de ``key``: chaves >= key, ou <= key se ``reverse``."""
+        key = self._key(key)
+        start = self._floor(key) if reverse else self._lower_bound(key)
+        for n in self._iter_nodes(start, reverse):
+            yield n.key, n.data, n.color
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        """Gera os itens com lo <= chave <= hi (None = sem limite)."""
+        lo = None if lo is None else self._key(lo)
+        hi = None if hi is None else self._key(hi)
+        if self.root is self.NULL:
+            return
+        if reverse:
+            start = self._maximum(self.root) if hi is None else self._floor(hi)
+            for n in self._iter_nodes(start, True):
+                if lo is not None and n.key < lo:
+                    return
+                yield n.key, n.data, n.color
+        else:
+            start = self._minimum(self.root) if lo is None else self._lower_bound(lo)
+            for n in self._iter_nodes(start):
+                if hi is not None and n.key > hi:
+                    return
+                yield n.key, n.data, n.color
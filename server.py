@@ -0,0 +1,342 @@
+"""Serviço do catálogo via socket (asyncio), sem interface gráfica.
+
+Protocolo: JSON por linha (UTF-8). Cada requisição é um objeto com ``op``
+e, opcionalmente, ``id`` (ecoado na resposta)::
+
+    {"id": 1, "op": "get", "key": "9788535914849"}
+    {"id": 2, "op": "put", "key": "9788535914849", "data": {...}}
+    {"id": 3, "op": "delete", "key": "9788535914849"}
+    {"id": 4, "op": "range", "lo": "978", "hi": "979", "limit": 100}
+    {"id": 5, "op": "batch", "ops": [{"op": "get", "key": "..."}, ...]}
+
+Resposta: ``{"id": 1, "ok": true, "result": ...}`` ou
+``{"id": 1, "ok": false, "error": "..."}``. As respostas de uma conexão
+saem na ordem das requisições, então o cliente pode enviar várias sem
+esperar (pipelining). A árvore só é tocada pelo laço de eventos, sem locks.
+
+Uso:
+    python server.py serve --port 7878 [--db acervo.db]
+    python server.py serve --unix /tmp/acervo.sock
+    python server.py load --port 7878 --clients 32 --pipeline 16
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from isbn import ISBN_CODEC
+from rbtree import RedBlackTree
+
+_LINE_LIMIT = 1 << 20   # maior requisição aceita (bytes)
+_RANGE_LIMIT = 1_000    # itens por resposta de "range", no máximo
+
+
+class CatalogueServer:
+    """Executa as requisições do protocolo sobre uma RedBlackTree.
+
+    Com ``store`` (ex.: DiskCatalogue), escritas vão primeiro para o disco,
+    como no App. Chaves são ISBNs normalizados (``ISBN_CODEC``), como na
+    interface e no catalog_io: o mesmo acervo.db serve aos três.
+    """
+
+    def __init__(self, tree: RedBlackTree = None, store=None):
+        if tree is None:
+            tree = (store.to_tree(key_codec=ISBN_CODEC) if store is not None
+                    else RedBlackTree(key_codec=ISBN_CODEC))
+        self.tree = tree
+        codec = tree.key_codec
+        self._show_key = str if codec is None else codec.decode
+        self.store = store
+        self._ops = {
+            "get": self._get,
+            "put": self._put,
+            "delete": self._delete,
+            "range": self._range,
+            "batch": self._batch,
+        }
+
+    # ---------- Comandos ----------
+    def _get(self, req):
+        node = self.tree.search(req["key"])
+        return None if node is None else node.data
+
+    def _put(self, req):
+        key, data = str(req["key"]), req.get("data")
+        if self.store is not None:
+            self.store.insert(key, data)
+        return self.tree.insert(key, data)
+
+    def _delete(self, req):
+        key = str(req["key"])
+        removed = self.tree.delete(key)
+        if removed and self.store is not None:
+            self.store.delete(key)
+        return removed
+
+    def _range(self, req):
+        limit = min(int(req.get("limit", _RANGE_LIMIT)), _RANGE_LIMIT)
+        items = self.tree.iter_range(req.get("lo"), req.get("hi"), bool(req.get("reverse")))
+        out = []
+        for key, data, _ in items:
+            if len(out) >= limit:
+                break
+            out.append([self._show_key(key), data])
+        return out
+
+    def _batch(self, req):
+        """Executa ``ops`` em ordem. Trechos seguidos de get/put/delete viram
+        uma chamada a search_many/insert_many/delete_many.
+
+        O resultado é sempre um por operação: se o trecho falha (ex.: um ISBN
+        que o codec recusa), ele é refeito operação a operação. Os métodos
+        em lote codificam todas as chaves antes de alterar a árvore, então
+        um trecho que falhou não deixou nada aplicado.
+        """
+        ops = req["ops"]
+        kinds = [r.get("op") if isinstance(r, dict) else None for r in ops]
+        results = []
+        i = 0
+        while i < len(ops):
+            op = kinds[i]
+            j = i
+            while j < len(ops) and kinds[j] == op:
+                j += 1
+            run = ops[i:j]
+            try:
+                results.extend(self._run(op, run))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                results.extend(self.execute(r) for r in run)
+            i = j
+        return results
+
+    def _run(self, op, run):
+        if op == "get":
+            nodes = self.tree.search_many([r["key"] for r in run])
+            return [self._ok(None if n is None else n.data) for n in nodes]
+        if op == "put" and self.store is None:
+            added = self.tree.insert_many([(str(r["key"]), r.get("data")) for r in run])
+            return [self._ok(a) for a in added]
+        if op == "delete" and self.store is None:
+            removed = self.tree.delete_many([str(r["key"]) for r in run])
+            return [self._ok(r) for r in removed]
+        return [self.execute(r) for r in run]
+
+    # ---------- Despacho ----------
+    @staticmethod
+    def _ok(result):
+        return {"ok": True, "result": result}
+
+    def execute(self, req) -> dict:
+        """Resposta (sem ``id``) para uma requisição já decodificada."""
+        try:
+            if not isinstance(req, dict):
+                raise ValueError(f"requisição deve ser um objeto JSON, não {type(req).__name__}: {req!r}")
+            handler = self._ops.get(req.get("op"))
+            if handler is None:
+                raise ValueError(f"operação desconhecida: {req.get('op')!r}")
+            if handler == self._batch and not isinstance(req.get("ops"), list):
+                raise ValueError("batch requer a lista 'ops'")
+            return self._ok(handler(req))
+        except KeyError as e:
+            return {"ok": False, "error": f"campo obrigatório ausente: {e.args[0]}"}
+        except (TypeError, ValueError, AttributeError) as e:
+            return {"ok": False, "error": str(e)}
+
+    def respond(self, line: bytes) -> bytes:
+        try:
+            req = json.loads(line)
+        except ValueError as e:
+            return _encode({"ok": False, "error": f"JSON inválido: {e}"})
+        resp = self.execute(req)
+        if isinstance(req, dict) and "id" in req:
+            resp["id"] = req["id"]
+        return _encode(resp)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Uma conexão: lê linhas e responde na ordem, sem esperar o cliente."""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # linha acima de _LINE_LIMIT
+                    writer.write(_encode({"ok": False, "error": "requisição grande demais"}))
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    writer.write(self.respond(line))
+                    # só suspende quando o buffer de saída passa do limite
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.store is not None:
+            from storage import COMPACT_LOG_BYTES
+            self.store.checkpoint(COMPACT_LOG_BYTES)
+            self.store.close()
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+async def serve(service: CatalogueServer, host="127.0.0.1", port=7878, unix=None):
+    if unix:
+        server = await asyncio.start_unix_server(service.handle, unix, limit=_LINE_LIMIT)
+    else:
+        server = await asyncio.start_server(service.handle, host, port, limit=_LINE_LIMIT)
+    where = unix or f"{host}:{port}"
+    print(f"catálogo ({len(service.tree):,} livros) ouvindo em {where}")
+    async with server:
+        await server.serve_forever()
+
+
+# ===============================
+# Cliente e gerador de carga
+# ===============================
+
+class CatalogueClient:
+    """Cliente assíncrono com pipelining: várias chamadas em voo por conexão."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._pending = {}
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=7878, unix=None):
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix, limit=_LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=_LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                resp = json.loads(line)
+                future = self._pending.pop(resp.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(resp)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("conexão encerrada"))
+            self._pending.clear()
+
+    async def call(self, op: str, **fields):
+        """Envia a requisição e devolve ``result`` (RuntimeError se ``ok`` for falso)."""
+        self._next_id += 1
+        req_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        self._writer.write(_encode({"id": req_id, "op": op, **fields}))
+        await self._writer.drain()
+        resp = await future
+        if not resp["ok"]:
+            raise RuntimeError(resp["error"])
+        return resp["result"]
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._reader_task.cancel()
+
+
+def _percentile(sorted_values, q: float) -> float:
+    return sorted_values[int(q * (len(sorted_values) - 1))]
+
+
+async def load(host="127.0.0.1", port=7878, unix=None, clients=16, pipeline=8,
+               requests=100_000, keys=100_000, writes=0.1, seed=1):
+    """Gera carga get/put e devolve ops/s e latências (ms)."""
+    first = await CatalogueClient.connect(host, port, unix)
+    key_space = [f"{i:013d}" for i in range(keys)]
+    for start in range(0, keys, 5_000):  # semeia o acervo em lotes
+        ops = [{"op": "put", "key": k, "data": {"isbn": k, "titulo": f"Título {k}"}}
+               for k in key_space[start:start + 5_000]]
+        await first.call("batch", ops=ops)
+    await first.close()
+
+    conns = [await CatalogueClient.connect(host, port, unix) for _ in range(clients)]
+    latencies = []
+    per_worker = max(1, requests // (clients * pipeline))
+
+    async def worker(conn, seed):
+        rng = random.Random(seed)
+        for _ in range(per_worker):
+            key = rng.choice(key_space)
+            t0 = time.perf_counter()
+            if rng.random() < writes:
+                await conn.call("put", key=key, data={"isbn": key, "rev": seed})
+            else:
+                await conn.call("get", key=key)
+            latencies.append(time.perf_counter() - t0)
+
+    # ``pipeline`` workers por conexão = requisições em voo em cada uma
+    workers = [worker(conn, seed * 1_000_003 + i * pipeline + j)
+               for i, conn in enumerate(conns) for j in range(pipeline)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - t0
+    for conn in conns:
+        await conn.close()
+    latencies.sort()
+    return {
+        "requisições": len(latencies),
+        "ops/s": len(latencies) / elapsed,
+        "p50 (ms)": _percentile(latencies, 0.50) * 1e3,
+        "p99 (ms)": _percentile(latencies, 0.99) * 1e3,
+        "máx (ms)": latencies[-1] * 1e3,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço do catálogo (JSON por linha)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "load"):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=7878)
+        p.add_argument("--unix", help="caminho de socket Unix (em vez de TCP)")
+        if name == "serve":
+            p.add_argument("--db", help="arquivo do acervo persistente (ver storage.py)")
+        else:
+            p.add_argument("--clients", type=int, default=16, help="conexões simultâneas")
+            p.add_argument("--pipeline", type=int, default=8, help="requisições em voo por conexão")
+            p.add_argument("--requests", type=int, default=100_000)
+            p.add_argument("--keys", type=int, default=100_000, help="livros semeados antes da carga")
+            p.add_argument("--writes", type=float, default=0.1, help="fração de put")
+    args = parser.parse_args(argv)
+
+    if args.command == "load":
+        res = asyncio.run(load(args.host, args.port, args.unix, args.clients, args.pipeline,
+                               args.requests, args.keys, args.writes))
+        for name, value in res.items():
+            print(f"  {name:<16} {value:>14,.1f}" if isinstance(value, float) else f"  {name:<16} {value:>14,}")
+        return
+
+    store = None
+    if args.db:
+        from storage import DiskCatalogue
+        store = DiskCatalogue(args.db, key_codec=ISBN_CODEC)
+    service = CatalogueServer(store=store)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""Catálogo particionado por faixas de ISBN entre processos.
+
+Cada shard é um processo com a sua própria RedBlackTree: a GIL prende uma
+árvore a um núcleo, N processos usam N núcleos. ``ShardedCatalogue``
+(no processo cliente) guarda só as fronteiras entre as faixas e roteia:
+
+- operações de uma chave vão para a shard dona da faixa (bisect);
+- lotes (``search_many``/``insert_many``/``delete_many``) são repartidos,
+  enviados a todas as shards de uma vez e recolhidos depois, para que as
+  shards trabalhem em paralelo;
+- ``iter_range`` é preguiçoso: pede páginas à shard da vez e só avança
+  quando o consumidor pede. Como as faixas não se sobrepõem, a fusão
+  ordenada dos resultados é a simples concatenação na ordem das shards.
+
+As chaves passam pelo ``isbn.ISBN_CODEC`` uma única vez, no cliente:
+"978-85-359-1484-9" e "9788535914849" são o mesmo livro e caem na mesma
+shard, e as shards só recebem (e comparam) inteiros. ``iter_range`` devolve
+as chaves decodificadas (ISBN sem hífens).
+
+``rebalance`` (chamado a cada ``rebalance_every`` escritas) divide a shard
+mais cheia na sua mediana quando ela passa de ``max_skew`` vezes a média, e
+funde o par vizinho mais vazio para manter o número de processos.
+
+Um ShardedCatalogue não é thread-safe: use um por thread cliente.
+"""
+import multiprocessing
+from bisect import bisect_right
+from itertools import islice
+
+from isbn import ISBN_CODEC
+from rbtree import RedBlackTree
+
+_encode = ISBN_CODEC.encode
+_decode = ISBN_CODEC.decode
+
+
+# ===============================
+# Lado da shard (processo filho)
+# ===============================
+
+def _search(tree, key):
+    node = tree.search(key)
+    return None if node is None else node.data
+
+
+def _search_many(tree, keys):
+    return [None if n is None else n.data for n in tree.search_many(keys)]
+
+
+def _range(tree, lo, hi, limit, inclusive):
+    items = ((k, d) for k, d, _ in tree.iter_range(lo, hi) if inclusive or k != lo)
+    return list(islice(items, limit))
+
+
+def _median(tree):
+    return tree.select(len(tree) // 2).key if len(tree) > 1 else None
+
+
+def _split(tree, key):
+    """Remove e devolve os itens com chave >= key."""
+    items = [(k, d) for k, d, _ in tree.iter_from(key)]
+    tree.delete_many([k for k, _ in items])
+    return items
+
+
+def _dump(tree):
+    items = [(k, d) for k, d, _ in tree.iter_items()]
+    tree.delete_many([k for k, _ in items])
+    return items
+
+
+_SHARD_OPS = {
+    "search": _search,
+    "search_many": _search_many,
+    "insert": RedBlackTree.insert,
+    "insert_many": RedBlackTree.insert_many,
+    "delete": RedBlackTree.delete,
+    "delete_many": RedBlackTree.delete_many,
+    "load": RedBlackTree.bulk_load,
+    "range": _range,
+    "median": _median,
+    "split": _split,
+    "dump": _dump,
+    "len": len,
+}
+
+
+def _shard_main(conn):
+    # select() acha a mediana para dividir; as chaves já chegam codificadas
+    # (o codec devolve inteiros como estão)
+    tree = RedBlackTree(order_stats=True, key_codec=ISBN_CODEC)
+    while True:
+        try:
+            op, args = conn.recv()
+        except EOFError:
+            break
+        except Exception as e:  # pedido que não desserializa: já saiu do pipe, responde o erro
+            conn.send((False, e))
+            continue
+        if op == "stop":
+            break
+        try:
+            reply = (True, _SHARD_OPS[op](tree, *args))
+        except Exception as e:  # devolvido ao cliente, que o relança
+            reply = (False, e)
+        conn.send(reply)
+    conn.close()
+
+
+class _Shard:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_shard_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, op, *args):
+        self.conn.send((op, args))
+
+    def recv(self):
+        ok, result = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, op, *args):
+        self.send(op, *args)
+        return self.recv()
+
+    def stop(self):
+        self.conn.send(("stop", ()))
+        self.process.join()
+        self.conn.close()
+
+
+# ===============================
+# Lado do cliente
+# ===============================
+
+def _even_bounds(workers: int, digits: int = 13):
+    """Fronteiras (codificadas) que dividem chaves de ``digits`` dígitos em partes iguais."""
+    top = 10 ** digits
+    return [_encode(f"{i * top // workers:0{digits}d}") for i in range(1, workers)]
+
+
+class ShardedCatalogue:
+    """Catálogo chave -> dados repartido em ``workers`` processos por faixa de chave."""
+
+    def __init__(self, workers: int = None, bounds=None, max_skew: float = 2.0,
+                 rebalance_every: int = 10_000, context=None):
+        """``bounds``: fronteiras iniciais (workers - 1 ISBNs crescentes);
+        por padrão, ISBNs de 13 dígitos divididos em partes iguais."""
+        workers = workers or multiprocessing.cpu_count()
+        self._ctx = context or multiprocessing.get_context()
+        self._bounds = [_encode(b) for b in bounds] if bounds is not None else _even_bounds(workers)
+        if len(self._bounds) != workers - 1 or self._bounds != sorted(self._bounds):
+            raise ValueError("bounds precisa de workers - 1 chaves em ordem crescente")
+        self._shards = [_Shard(self._ctx) for _ in range(workers)]
+        self._sizes = [0] * workers
+        self.workers = workers
+        self.max_skew = max_skew
+        self.rebalance_every = rebalance_every
+        self._writes = 0
+
+    @classmethod
+    def from_sorted(cls, items, workers: int = None, **kwargs):
+        """Catálogo com fronteiras nos quantis de ``items`` (pares (chave, dados))."""
+        items = RedBlackTree._sorted_unique(items, _encode)
+        workers = workers or multiprocessing.cpu_count()
+        cuts = [len(items) * i // workers for i in range(workers + 1)]
+        bounds = [items[c][0] for c in cuts[1:-1]] if len(items) >= workers else None
+        catalogue = cls(workers, bounds, **kwargs)
+        for i, shard in enumerate(catalogue._shards):
+            part = items[cuts[i]:cuts[i + 1]] if bounds is not None else []
+            shard.send("load", part)
+            catalogue._sizes[i] = len(part)
+        for shard in catalogue._shards:
+            shard.recv()
+        if bounds is None:
+            catalogue.insert_many(items)
+        return catalogue
+
+    def __len__(self):
+        return sum(self._sizes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for shard in self._shards:
+            shard.stop()
+        self._shards = []
+
+    def _route(self, key: int) -> int:
+        return bisect_right(self._bounds, key)
+
+    def shard_sizes(self):
+        return list(self._sizes)
+
+    # ---------- Uma chave ----------
+    def search(self, key):
+        """Dados da chave ou None."""
+        key = _encode(key)
+        return self._shards[self._route(key)].call("search", key)
+
+    def insert(self, key, data) -> bool:
+        key = _encode(key)
+        i = self._route(key)
+        added = self._shards[i].call("insert", key, data)
+        self._sizes[i] += added
+        self._wrote(1)
+        return added
+
+    def delete(self, key) -> bool:
+        key = _encode(key)
+        i = self._route(key)
+        removed = self._shards[i].call("delete", key)
+        self._sizes[i] -= removed
+        self._wrote(1)
+        return removed
+
+    # ---------- Lotes (scatter-gather) ----------
+    def _scatter(self, op, entries, key_of=None, grows: int = 0):
+        """Reparte ``entries`` por shard, envia tudo, recolhe e devolve os
+        resultados na ordem de ``entries``. ``key_of`` extrai a chave de
+        cada entrada (None: a entrada é a própria chave).
+
+        ``grows`` (+1 inserção, -1 remoção) soma os resultados verdadeiros
+        ao tamanho de cada shard que respondeu, inclusive se outra falhou.
+        """
+        groups = {}
+        for pos, entry in enumerate(entries):
+            groups.setdefault(self._route(entry if key_of is None else key_of(entry)), []).append(pos)
+        error = None
+        sent = {}
+        for i, positions in groups.items():
+            try:
+                self._shards[i].send(op, [entries[p] for p in positions])
+            except Exception as e:  # ex.: dados que não serializam; nada foi escrito no pipe
+                error = error or e
+                continue
+            sent[i] = positions
+        out = [None] * len(entries)
+        for i, positions in sent.items():
+            # recolhe a resposta de todas as shards mesmo após um erro: uma
+            # resposta deixada no pipe seria lida pela próxima chamada
+            try:
+                results = self._shards[i].recv()
+            except Exception as e:
+                error = error or e
+                continue
+            if grows:
+                self._sizes[i] += grows * sum(results)
+            for p, r in zip(positions, results):
+                out[p] = r
+        if error is not None:
+            raise error
+        return out
+
+    def search_many(self, keys):
+        """Dados (ou None) de cada chave, na ordem de ``keys``."""
+        return self._scatter("search_many", list(map(_encode, keys)))
+
+    def insert_many(self, items):
+        """Insere/atualiza pares (chave, dados); por item, True se a chave era nova."""
+        items = [(_encode(k), d) for k, d in items]
+        out = self._scatter("insert_many", items, lambda item: item[0], grows=1)
+        self._wrote(len(items))
+        return out
+
+    def delete_many(self, keys):
+        """Remove as chaves; por chave, True se existia."""
+        out = self._scatter("delete_many", list(map(_encode, keys)), grows=-1)
+        self._wrote(len(out))
+        return out
+
+    def iter_range(self, lo=None, hi=None, page: int = 1_000):
+        """Gera (chave, dados) com lo <= chave <= hi, pedindo ``page`` itens por vez."""
+        lo = None if lo is None else _encode(lo)
+        hi = None if hi is None else _encode(hi)
+        cursor, inclusive = lo, True
+        while True:
+            # reroteia a cada página: um rebalance no meio da iteração não a afeta
+            i = 0 if cursor is None else self._route(cursor)
+            items = self._shards[i].call("range", cursor, hi, page, inclusive)
+            for k, d in items:
+                yield _decode(k), d
+            if len(items) == page:
+                cursor, inclusive = items[-1][0], False
+                continue
+            if i == len(self._bounds):
+                return
+            cursor, inclusive = self._bounds[i], True
+            if hi is not None and cursor > hi:
+                return
+
+    def iter_items(self):
+        return self.iter_range()
+
+    # ---------- Rebalanceamento ----------
+    def _wrote(self, count: int):
+        self._writes += count
+        if self.rebalance_every and self._writes >= self.rebalance_every:
+            self._writes = 0
+            self.rebalance()
+
+    def rebalance(self) -> int:
+        """Divide shards acima de ``max_skew`` x a média e funde vizinhas
+        pequenas. Devolve quantas divisões fez."""
+        splits = 0
+        for _ in range(self.workers):
+            mean = sum(self._sizes) / len(self._sizes)
+            i = max(range(len(self._sizes)), key=self._sizes.__getitem__)
+            if self._sizes[i] <= self.max_skew * mean or self._sizes[i] < 2:
+                break
+            self._split(i)
+            splits += 1
+            # funde o par vizinho mais vazio (menos as duas metades recém-criadas)
+            pairs = [j for j in range(len(self._shards) - 1) if j != i]
+            if len(self._shards) > self.workers and pairs:
+                self._merge(min(pairs, key=lambda j: self._sizes[j] + self._sizes[j + 1]))
+        return splits
+
+    def _split(self, i: int):
+        shard = self._shards[i]
+        median = shard.call("median")
+        moved = shard.call("split", median)
+        new = _Shard(self._ctx)
+        new.call("load", moved)
+        self._shards.insert(i + 1, new)
+        self._bounds.insert(i, median)
+        self._sizes[i] -= len(moved)
+        self._sizes.insert(i + 1, len(moved))
+
+    def _merge(self, j: int):
+        """Funde a shard j + 1 na shard j."""
+        right = self._shards.pop(j + 1)
+        self._shards[j].call("load", right.call("dump"))
+        right.stop()
+        del self._bounds[j]
+        self._sizes[j] += self._sizes.pop(j + 1)
@@ -0,0 +1,389 @@
+"""Catálogo persistente em disco: arquivo de nós mapeado em memória + WAL.
+
+Arquivos (para ``DiskCatalogue("acervo.db")``):
+
+- ``acervo.db``: checkpoint imutável. Cabeçalho, registros de tamanho fixo
+  ordenados por chave (a árvore balanceada implícita, percorrida por busca
+  binária direto no ``mmap``) e, em seguida, o heap com os dados (JSON).
+- ``acervo.db.wal``: log append-only de ``insert``/``delete`` posteriores ao
+  checkpoint. Cada entrada tem CRC32; uma cauda truncada por queda do
+  processo é descartada na reabertura.
+
+Abrir não reconstrói nada: mapeia o checkpoint e reaplica apenas o WAL numa
+RedBlackTree pequena (o "delta"). ``checkpoint()`` funde os dois num arquivo
+novo, troca-o atomicamente (os.replace) e zera o WAL.
+
+Checkpoint e WAL levam um número de geração. ``rewrite`` grava o arquivo
+novo com a geração seguinte e só depois zera o WAL; se o processo cair
+entre os dois passos, o WAL antigo (geração anterior) é ignorado na
+reabertura em vez de ser reaplicado sobre o conteúdo novo.
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+from rbtree import RedBlackTree
+
+_MAGIC = b"RBCAT002"
+_HEADER = struct.Struct("<8sQQQQ")  # magic, nº de registros, início do heap, geração, flags
+_LEGACY_MAGIC = b"RBCAT001"
+_LEGACY_HEADER = struct.Struct("<8sQQ")  # sem geração nem flags
+_WAL_MAGIC = b"RBWAL001"
+_WAL_HEADER = struct.Struct("<8sQ")  # magic, geração do checkpoint a que o log se aplica
+_F_CANONICAL = 1  # flag: chaves já na forma canônica de um key_codec
+_RECORD = struct.Struct("<32sQI")  # chave (utf-8, completada com \0), offset e tamanho no heap
+_WAL_ENTRY = struct.Struct("<cHII")  # op, tam. da chave, tam. dos dados, crc32
+_KEY_BYTES = 32
+
+# tamanho de WAL a partir do qual fechar o acervo vale um checkpoint: um log
+# menor sai mais barato reaplicar na abertura do que regravar o arquivo todo
+COMPACT_LOG_BYTES = 1 << 20
+
+_TOMBSTONE = object()  # marca remoção no delta
+
+
+def _encode_key(key) -> bytes:
+    raw = str(key).encode("utf-8")
+    if len(raw) > _KEY_BYTES:
+        raise ValueError(f"chave com mais de {_KEY_BYTES} bytes: {key!r}")
+    return raw
+
+
+def _fsync_dir(path: str):
+    """Torna durável um os.replace em ``path`` (POSIX; no Windows não há como)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _encode_data(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class DiskCatalogue:
+    """Catálogo chave -> dados (dict serializável em JSON) persistido em disco.
+
+    ``sync=True`` faz fsync a cada operação (sobrevive a queda de energia);
+    o padrão só descarrega para o sistema operacional, o que já cobre a
+    queda do processo.
+
+    Com ``key_codec`` (ex.: ``isbn.ISBN_CODEC``), as chaves são gravadas na
+    forma canônica (``key_codec.normalize``) e ``to_tree`` cria a árvore
+    com o mesmo codec. Um checkpoint gravado sem codec é convertido ao ser
+    aberto com um (``_migrate_keys``), e as chaves do WAL são normalizadas
+    ao reaplicá-lo.
+    """
+
+    def __init__(self, path: str, sync: bool = False, key_codec=None):
+        self.path = path
+        self.wal_path = path + ".wal"
+        self.sync = sync
+        self.key_codec = key_codec
+        self._key = str if key_codec is None else key_codec.normalize
+        self._mm = None
+        self._file = None
+        self._wal = None
+        self._generation = self._flags = 0
+        self._open_checkpoint()
+        if key_codec is not None and not self._flags & _F_CANONICAL:
+            self._migrate_keys()
+        self._delta = RedBlackTree()
+        self._count = self._base_count
+        self._replay_wal()
+        self._wal = open(self.wal_path, "ab")
+
+    # ---------- Checkpoint (somente leitura, mmap) ----------
+    def _open_checkpoint(self):
+        if not os.path.exists(self.path):
+            os.replace(self._write_checkpoint(self.path, iter(()), 1), self.path)
+            _fsync_dir(self.path)
+        self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        magic = self._mm[:8]
+        if magic == _MAGIC:
+            _, self._base_count, self._heap, self._generation, self._flags = _HEADER.unpack_from(self._mm, 0)
+            self._records = _HEADER.size
+        elif magic == _LEGACY_MAGIC:
+            # formato anterior: geração 0, como o WAL sem cabeçalho
+            _, self._base_count, self._heap = _LEGACY_HEADER.unpack_from(self._mm, 0)
+            self._generation = self._flags = 0
+            self._records = _LEGACY_HEADER.size
+        else:
+            raise ValueError(f"{self.path}: não é um catálogo RBCAT")
+
+    def _close_checkpoint(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def _base_key(self, i: int) -> bytes:
+        off = self._records + i * _RECORD.size
+        return self._mm[off:off + _KEY_BYTES].rstrip(b"\0")
+
+    def _base_data(self, i: int):
+        _, off, length = _RECORD.unpack_from(self._mm, self._records + i * _RECORD.size)
+        start = self._heap + off
+        return json.loads(self._mm[start:start + length])
+
+    def _base_find(self, key: str):
+        """Índice do registro com a chave ou None (busca binária no mmap)."""
+        raw = key.encode("utf-8")
+        lo, hi = 0, self._base_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = self._base_key(mid)
+            if k < raw:
+                lo = mid + 1
+            elif k > raw:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def _iter_base(self):
+        for i in range(self._base_count):
+            yield self._base_key(i).decode("utf-8"), i
+
+    @staticmethod
+    def _write_checkpoint(path: str, items, generation: int, flags: int = 0) -> str:
+        """Grava (chave, dados) em ordem num arquivo temporário ao lado de
+        ``path`` e devolve seu nome; quem chama faz o os.replace.
+
+        Em streaming: registros vão direto para o arquivo e o heap para um
+        temporário anônimo, anexado no fim.
+        """
+        tmp = path + ".tmp"
+        count = heap_size = 0
+        with open(tmp, "wb") as f, tempfile.TemporaryFile() as heap:
+            f.write(_HEADER.pack(_MAGIC, 0, 0, generation, flags))
+            for key, data in items:
+                payload = _encode_data(data)
+                f.write(_RECORD.pack(_encode_key(key), heap_size, len(payload)))
+                heap.write(payload)
+                heap_size += len(payload)
+                count += 1
+            heap.seek(0)
+            shutil.copyfileobj(heap, f)
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, count, _HEADER.size + count * _RECORD.size, generation, flags))
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp
+
+    # ---------- WAL ----------
+    def _replay_wal(self):
+        if not os.path.exists(self.wal_path):
+            self._reset_wal()
+            return
+        with open(self.wal_path, "rb") as f:
+            log = f.read()
+        if log[:8] == _WAL_MAGIC and len(log) >= _WAL_HEADER.size:
+            _, generation = _WAL_HEADER.unpack_from(log, 0)
+            pos = _WAL_HEADER.size
+        else:
+            generation, pos = 0, 0  # WAL do formato anterior, sem cabeçalho
+        if generation != self._generation:
+            # log de um checkpoint já substituído: suas operações estão no
+            # arquivo novo (checkpoint) ou foram descartadas por ele (rewrite)
+            self._reset_wal()
+            return
+        while pos + _WAL_ENTRY.size <= len(log):
+            op, klen, dlen, crc = _WAL_ENTRY.unpack_from(log, pos)
+            end = pos + _WAL_ENTRY.size + klen + dlen
+            body = log[pos + _WAL_ENTRY.size:end]
+            if end > len(log) or zlib.crc32(body) != crc:
+                break  # cauda incompleta: a operação nunca foi confirmada
+            try:
+                key = self._key(body[:klen].decode("utf-8"))  # log gravado antes do codec
+            except ValueError as e:
+                raise ValueError(f"{self.wal_path}: {e}") from None
+            if op == b"I":
+                self._apply_insert(key, json.loads(body[klen:]))
+            else:
+                self._apply_delete(key)
+            pos = end
+        if pos != len(log):
+            with open(self.wal_path, "r+b") as f:
+                f.truncate(pos)
+
+    def _reset_wal(self):
+        """WAL vazio da geração atual (troca atômica, como o checkpoint)."""
+        tmp = self.wal_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_WAL_HEADER.pack(_WAL_MAGIC, self._generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.wal_path)
+        _fsync_dir(self.wal_path)
+
+    def _log(self, op: bytes, raw_key: bytes, payload: bytes = b""):
+        body = raw_key + payload
+        self._wal.write(_WAL_ENTRY.pack(op, len(raw_key), len(payload), zlib.crc32(body)))
+        self._wal.write(body)
+        self._wal.flush()
+        if self.sync:
+            os.fsync(self._wal.fileno())
+
+    # ---------- API ----------
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        key = self._key(key)
+        node = self._delta.search(key)
+        if node is not None:
+            return node.data is not _TOMBSTONE
+        return self._base_find(key) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(self, key):
+        """Dados da chave ou None."""
+        key = self._key(key)
+        node = self._delta.search(key)
+        if node is not None:
+            return None if node.data is _TOMBSTONE else node.data
+        i = self._base_find(key)
+        return None if i is None else self._base_data(i)
+
+    def _apply_insert(self, key: str, data) -> bool:
+        added = key not in self
+        self._delta.insert(key, data)
+        self._count += added
+        return added
+
+    def _apply_delete(self, key: str) -> bool:
+        if key not in self:
+            return False
+        if self._base_find(key) is None:
+            self._delta.delete(key)
+        else:
+            self._delta.insert(key, _TOMBSTONE)
+        self._count -= 1
+        return True
+
+    def insert(self, key, data) -> bool:
+        """Insere ou atualiza (registrando no WAL antes). True se a chave é nova."""
+        key = self._key(key)
+        self._log(b"I", _encode_key(key), _encode_data(data))
+        return self._apply_insert(key, data)
+
+    def delete(self, key) -> bool:
+        """Remove a chave. True se removeu, False se não existia."""
+        key = self._key(key)
+        if key not in self:
+            return False
+        self._log(b"D", _encode_key(key))
+        return self._apply_delete(key)
+
+    def iter_items(self):
+        """Gera (chave, dados) em ordem, fundindo checkpoint e delta."""
+        base = self._iter_base()
+        delta = ((k, d) for k, d, _ in self._delta.iter_items())
+        b = next(base, None)
+        d = next(delta, None)
+        while b is not None or d is not None:
+            if d is None or (b is not None and b[0] < d[0]):
+                yield b[0], self._base_data(b[1])
+                b = next(base, None)
+                continue
+            if b is not None and b[0] == d[0]:
+                b = next(base, None)  # o delta sobrepõe o checkpoint
+            if d[1] is not _TOMBSTONE:
+                yield d
+            d = next(delta, None)
+
+    def to_tree(self, engine=RedBlackTree, **kwargs):
+        """Árvore em memória (RedBlackTree ou outro CatalogueEngine) com o
+        conteúdo atual (construção linear)."""
+        kwargs.setdefault("key_codec", self.key_codec)
+        return engine.from_sorted(self.iter_items(), **kwargs)
+
+    def checkpoint(self, min_log: int = 0) -> bool:
+        """Funde checkpoint + WAL num novo arquivo e esvazia o WAL.
+
+        Não faz nada se o WAL tem até ``min_log`` bytes de entradas (com o
+        padrão, só se estiver vazio). Devolve se regravou o arquivo.
+        """
+        if self.wal_size() <= min_log:
+            return False
+        self.rewrite(self.iter_items())
+        return True
+
+    def wal_size(self) -> int:
+        """Bytes de entradas no WAL (sem o cabeçalho)."""
+        return max(0, os.fstat(self._wal.fileno()).st_size - _WAL_HEADER.size)
+
+    def _ascending(self, items):
+        """``items`` com as chaves canônicas, conferindo a ordem estrita."""
+        prev = None
+        for key, data in items:
+            key = self._key(key)
+            if prev is not None and key <= prev:
+                raise ValueError(f"chaves fora de ordem ou repetidas: {prev!r}, {key!r}")
+            prev = key
+            yield key, data
+
+    def _replace_checkpoint(self, items, generation: int):
+        flags = _F_CANONICAL if self.key_codec is not None else 0
+        try:
+            tmp = self._write_checkpoint(self.path, self._ascending(items), generation, flags)
+        except ValueError:
+            os.remove(self.path + ".tmp")
+            raise
+        self._close_checkpoint()  # o Windows não substitui arquivo mapeado
+        os.replace(tmp, self.path)
+        _fsync_dir(self.path)
+        self._open_checkpoint()
+
+    def _migrate_keys(self):
+        """Regrava um checkpoint de antes do codec com as chaves canônicas.
+
+        A forma canônica muda a ordem (ISBN-10 vira 978...), então os
+        registros são reordenados; duas grafias do mesmo ISBN ficam com a
+        última em ordem de chave original. A geração não muda: o conteúdo é
+        o mesmo e o WAL continua valendo sobre ele.
+        """
+        items = {}
+        for key, i in self._iter_base():
+            try:
+                items[self._key(key)] = self._base_data(i)
+            except ValueError as e:
+                raise ValueError(f"{self.path}: {e}") from None
+        self._replace_checkpoint(sorted(items.items()), self._generation)
+
+    def rewrite(self, items):
+        """Troca todo o conteúdo por ``items`` (pares (chave, dados) em ordem
+        crescente de chave) num checkpoint novo, sem passar pelo WAL.
+
+        Com key_codec, as chaves são levadas à forma canônica; ``items``
+        precisa estar em ordem nela (como sai de uma árvore com o codec).
+        """
+        self._replace_checkpoint(items, self._generation + 1)
+        # se cair aqui, o WAL ainda é da geração anterior e a reabertura o
+        # ignora: não pode ser reaplicado sobre o conteúdo de um rewrite
+        self._wal.close()
+        self._reset_wal()
+        self._wal = open(self.wal_path, "ab")
+        self._delta = RedBlackTree()
+        self._count = self._base_count
+
+    def close(self):
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+        self._close_checkpoint()
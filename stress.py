@@ -0,0 +1,435 @@
+"""Teste de estresse diferencial: o motor do catálogo contra um modelo trivial.
+
+Gera, a partir de uma semente, uma sequência de operações mistas (insert,
+delete, buscas, lotes, faixas, rank/select, índice secundário), executa
+cada uma no motor e num modelo de referência (dict + lista ordenada) e
+compara os resultados. ``validate()`` (invariantes da árvore) roda após
+as operações 1, 2, 4, 8, ... e depois a cada ``--validate-every``, para
+pegar cedo defeitos que só aparecem com a árvore pequena. Uma operação que
+passe de ``--timeout`` segundos (laço infinito numa árvore corrompida)
+também é uma divergência.
+
+Na primeira divergência, a sequência até ela é minimizada por delta
+debugging (ddmin) e o resultado sai como um script Python que reproduz o
+problema — pronto para virar um caso de regressão.
+
+Uso:
+    python stress.py --ops 1000000 --seed 1
+    python stress.py --ops 200000 --seeds 20 --cache 64 --indexes
+    python stress.py --engine btree --ops 1000000 --out repro.py
+"""
+import _thread
+import argparse
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from itertools import islice
+
+from rbtree import InvariantError, RedBlackTree
+
+
+# ===============================
+# Índice usado nos testes (dados são inteiros)
+# ===============================
+
+def index_extract(data):
+    return data % 100
+
+
+def index_encode(value):
+    return f"{int(value):03d}"
+
+
+# ===============================
+# Modelo de referência
+# ===============================
+
+class Model:
+    """Mapa ordenado ingênuo com a semântica esperada de cada operação."""
+
+    def __init__(self):
+        self.data = {}
+        self.keys = []
+
+    def _put(self, k, d):
+        new = k not in self.data
+        if new:
+            insort(self.keys, k)
+        self.data[k] = d
+        return new
+
+    def insert(self, k, d):
+        return self._put(k, d)
+
+    def delete(self, k):
+        if k not in self.data:
+            return False
+        del self.data[k]
+        del self.keys[bisect_left(self.keys, k)]
+        return True
+
+    def search(self, k):
+        return self.data.get(k)
+
+    def search_many(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def insert_many(self, items):
+        return [self._put(k, d) for k, d in items]
+
+    def delete_many(self, keys):
+        return [self.delete(k) for k in keys]
+
+    def bulk_load(self, items):
+        for k, d in items:
+            self._put(k, d)
+
+    def range(self, lo, hi, reverse, limit):
+        keys = self.keys[bisect_left(self.keys, lo):bisect_right(self.keys, hi)]
+        if reverse:
+            keys.reverse()
+        return [(k, self.data[k]) for k in keys[:limit]]
+
+    def rank(self, k):
+        return bisect_left(self.keys, k)
+
+    def select(self, i):
+        k = self.keys[i]  # IndexError como o motor
+        return k, self.data[k]
+
+    def count_range(self, lo, hi):
+        return max(0, bisect_right(self.keys, hi) - bisect_left(self.keys, lo))
+
+    def len(self):
+        return len(self.data)
+
+    def find_range(self, lo, hi):
+        hits = [(index_encode(index_extract(d)), k) for k, d in self.data.items()
+                if lo <= index_extract(d) <= hi]
+        hits.sort()
+        return [(k, self.data[k]) for _, k in hits]
+
+
+# ===============================
+# Motor sob teste
+# ===============================
+
+def make_engine(engine="rbtree", order_stats=True, cache_size=0, indexes=False):
+    if engine == "btree":
+        from btree import BTree
+        tree = BTree(order=8)  # nós pequenos: mais divisões e fusões por operação
+    else:
+        tree = RedBlackTree(order_stats=order_stats, cache_size=cache_size)
+    if indexes:
+        tree.add_index("mod", index_extract, index_encode)
+    return tree
+
+
+def _engine_call(tree, op):
+    """Executa ``op`` no motor, devolvendo o resultado no formato do Model."""
+    name, *args = op
+    if name == "search":
+        node = tree.search(args[0])
+        return None if node is None else node.data
+    if name == "search_many":
+        return [None if n is None else n.data for n in tree.search_many(args[0])]
+    if name == "range":
+        lo, hi, reverse, limit = args
+        return [(k, d) for k, d, _ in islice(tree.iter_range(lo, hi, reverse), limit)]
+    if name == "select":
+        node = tree.select(args[0])
+        return node.key, node.data
+    if name == "len":
+        return len(tree)
+    if name == "find_range":
+        return [(k, d) for k, d, _ in tree.find_range("mod", *args)]
+    return getattr(tree, name)(*args)
+
+
+def _outcome(fn):
+    try:
+        return ("ok", fn())
+    except (KeyboardInterrupt, MemoryError):
+        raise
+    except Exception as e:
+        return ("erro", type(e).__name__)
+
+
+# ===============================
+# Geração das operações
+# ===============================
+
+# (peso, nome); consultas de ordem só com order_stats, find_range só com índice
+_MIX = (
+    (30, "insert"), (22, "delete"), (14, "search"), (3, "insert_many"), (3, "delete_many"),
+    (3, "search_many"), (1, "bulk_load"), (6, "range"), (4, "rank"), (4, "select"),
+    (4, "count_range"), (2, "len"), (4, "find_range"),
+)
+
+
+def generate(seed: int, count: int, key_space: int = 5_000, order_stats=True, indexes=False):
+    """Gera ``count`` operações (tuplas (nome, *args)), sempre as mesmas para a semente."""
+    rng = random.Random(seed)
+    skip = set()
+    if not order_stats:
+        skip.update(("rank", "select", "count_range"))
+    if not indexes:
+        skip.add("find_range")
+    mix = [(w, name) for w, name in _MIX if name not in skip]
+    names = [name for _, name in mix]
+    weights = [w for w, _ in mix]
+
+    def key():
+        return f"{rng.randrange(key_space):06d}"
+
+    def batch():
+        # lotes pequenos (laço) ou grandes em relação à árvore (reconstrução)
+        return rng.randint(1, 8) if rng.random() < 0.7 else rng.randint(key_space // 10, key_space)
+
+    for i in range(count):
+        name = rng.choices(names, weights)[0]
+        if name == "insert":
+            yield name, key(), i
+        elif name in ("delete", "search", "rank"):
+            yield name, key()
+        elif name in ("insert_many", "bulk_load"):
+            yield name, [(key(), i * 10_000 + j) for j in range(batch())]
+        elif name in ("delete_many", "search_many"):
+            yield name, [key() for _ in range(batch())]
+        elif name == "range":
+            lo, hi = sorted((key(), key()))
+            yield name, lo, hi, rng.random() < 0.5, rng.randint(1, 64)
+        elif name == "select":
+            yield name, rng.randint(-key_space // 2, key_space // 2)
+        elif name == "count_range":
+            yield name, key(), key()  # lo > hi também vale (0)
+        elif name == "find_range":
+            lo = rng.randrange(100)
+            yield name, lo, lo + rng.randrange(5)
+        else:
+            yield (name,)
+
+
+# ===============================
+# Execução e minimização
+# ===============================
+
+Divergence = namedtuple("Divergence", "index op expected got kind")
+
+
+class _Watchdog:
+    """Interrompe a thread principal (KeyboardInterrupt) se o trecho marcado
+    com ``started`` passar de ``timeout`` segundos; ``fired`` distingue
+    isso de um Ctrl-C de verdade."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.started = None
+        self.fired = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _watch(self):
+        while not self._stop.wait(min(self.timeout / 4, 1.0)):
+            started = self.started
+            if started is not None and time.monotonic() - started > self.timeout:
+                self.fired = True
+                _thread.interrupt_main()
+                return
+
+
+def _validate_due(n: int, validate_every: int) -> bool:
+    """Após a n-ésima operação: potências de 2, depois múltiplos de validate_every."""
+    return bool(validate_every) and (n & (n - 1) == 0 or n % validate_every == 0)
+
+
+def run(ops, config: dict, validate_every: int = 10_000, timeout: float = 10.0):
+    """Executa ``ops`` no motor e no modelo; devolve a primeira Divergence ou None."""
+    tree = make_engine(**config)
+    model = Model()
+    i, op, expected = -1, None, None
+    with _Watchdog(timeout) as watchdog:
+        try:
+            for i, op in enumerate(ops):
+                expected = _outcome(lambda: getattr(model, op[0])(*op[1:]))
+                watchdog.started = time.monotonic()
+                got = _outcome(lambda: _engine_call(tree, op))
+                watchdog.started = None
+                if got != expected:
+                    return Divergence(i, op, expected, got, "resultado")
+                if _validate_due(i + 1, validate_every):
+                    expected = None
+                    watchdog.started = time.monotonic()
+                    error = _validate(tree)
+                    watchdog.started = None
+                    if error:
+                        return Divergence(i, op, None, ("invariante", error), "invariante")
+            expected = None
+            watchdog.started = time.monotonic()
+            error = _validate(tree)
+            watchdog.started = None
+        except KeyboardInterrupt:
+            if not watchdog.fired:
+                raise
+            return Divergence(i, op, expected, ("travou", f"mais de {timeout:g} s"), "travou")
+    if error:
+        return Divergence(i, op, None, ("invariante", error), "invariante")
+    return None
+
+
+def _validate(tree):
+    try:
+        tree.validate()
+    except InvariantError as e:
+        return str(e)
+    return None
+
+
+def _ddmin(items, fails):
+    """Reduz a lista ``items`` enquanto ``fails`` aceitar um pedaço dela.
+
+    ``fails(candidato)`` devolve a lista com que continuar (o candidato ou
+    um prefixo dele) ou ``None`` se o candidato não reproduz o problema.
+    """
+    n = 2
+    while len(items) >= 2:
+        chunk = -(-len(items) // n)
+        reduced = False
+        for start in range(0, len(items), chunk):
+            subset = items[start:start + chunk]
+            complement = items[:start] + items[start + chunk:]
+            for candidate, next_n in ((subset, 2), (complement, max(n - 1, 2))):
+                kept = fails(candidate)
+                if kept is not None:
+                    items, n, reduced = kept, next_n, True
+                    break
+            if reduced:
+                break
+        if not reduced:
+            if n >= len(items):
+                break
+            n = min(len(items), 2 * n)
+    return items
+
+
+def minimize(ops, config: dict, div: Divergence, max_tests: int = 5_000, timeout: float = 10.0):
+    """ddmin: a menor subsequência de ``ops`` que ainda diverge.
+
+    Qualquer divergência conta: com os invariantes conferidos a cada
+    operação, o mesmo defeito costuma aparecer antes como invariante
+    quebrado do que como resultado errado — e a reprodução fica menor.
+    Depois das operações, encolhe as listas de chaves de cada lote que
+    sobrou (``insert_many``, ``bulk_load``, ``delete_many``, ``search_many``).
+    """
+    tests = 0
+
+    def diverges(candidate):
+        nonlocal tests
+        if tests >= max_tests:
+            return None
+        tests += 1
+        return run(candidate, config, 1 if len(candidate) <= 2_000 else 1_000, timeout)
+
+    def fails(candidate):
+        found = diverges(candidate)
+        return None if found is None else candidate[:found.index + 1]
+
+    ops = _ddmin(list(ops[:div.index + 1]), fails)
+    for pos, (name, *args) in enumerate(ops):
+        if name not in ("insert_many", "bulk_load", "delete_many", "search_many"):
+            continue
+
+        def shrinks(batch):
+            return batch if diverges(ops[:pos] + [(name, batch)] + ops[pos + 1:]) else None
+
+        # lote vazio primeiro: muitas vezes o lote só está ali por acaso
+        if shrinks([]) is not None:
+            ops[pos] = (name, [])
+        else:
+            ops[pos] = (name, _ddmin(list(args[0]), shrinks))
+    return ops
+
+
+def reproducer(ops, config: dict, div: Divergence) -> str:
+    """Script Python que refaz ``ops`` e termina na divergência."""
+    lines = ["# gerado por stress.py", "from itertools import islice", ""]
+    if config.get("engine") == "btree":
+        lines += ["from btree import BTree", "", "t = BTree(order=8)"]
+    else:
+        lines += ["from rbtree import RedBlackTree", "",
+                  f"t = RedBlackTree(order_stats={config.get('order_stats', True)!r}, "
+                  f"cache_size={config.get('cache_size', 0)!r})"]
+    if config.get("indexes"):
+        lines[2:2] = ["from stress import index_encode, index_extract"]
+        lines.append('t.add_index("mod", index_extract, index_encode)')
+    for op in ops:
+        name, *args = op
+        call = ", ".join(map(repr, args))
+        if name == "range":
+            lo, hi, reverse, limit = args
+            lines.append(f"list(islice(t.iter_range({lo!r}, {hi!r}, {reverse!r}), {limit!r}))")
+        elif name == "len":
+            lines.append("len(t)")
+        elif name == "find_range":
+            lines.append(f'list(t.find_range("mod", {call}))')
+        else:
+            lines.append(f"t.{name}({call})")
+    if div.expected is None:  # invariante quebrado (ou validate travou)
+        lines.append(f"t.validate()  # {div.got[1]}")
+    else:
+        lines[-1] += f"  # esperado {div.expected!r}, obtido {div.got!r}"
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de estresse diferencial do catálogo")
+    parser.add_argument("--ops", type=int, default=1_000_000, help="operações por semente")
+    parser.add_argument("--seed", type=int, default=1, help="primeira semente")
+    parser.add_argument("--seeds", type=int, default=1, help="quantas sementes (seed, seed+1, ...)")
+    parser.add_argument("--keys", type=int, default=5_000, help="tamanho do espaço de chaves")
+    parser.add_argument("--engine", choices=("rbtree", "btree"), default="rbtree")
+    parser.add_argument("--no-order-stats", action="store_true", help="RedBlackTree sem rank/select")
+    parser.add_argument("--cache", type=int, default=0, help="cache_size da RedBlackTree")
+    parser.add_argument("--indexes", action="store_true", help="com um índice secundário")
+    parser.add_argument("--validate-every", type=int, default=10_000)
+    parser.add_argument("--timeout", type=float, default=10.0, help="segundos por operação antes de acusar travamento")
+    parser.add_argument("--out", help="grava o script de reprodução neste arquivo")
+    args = parser.parse_args(argv)
+
+    config = {"engine": args.engine, "order_stats": not args.no_order_stats,
+              "cache_size": args.cache, "indexes": args.indexes}
+    for seed in range(args.seed, args.seed + args.seeds):
+        gen_args = (args.keys, config["order_stats"] or args.engine == "btree", args.indexes)
+        t0 = time.perf_counter()
+        div = run(generate(seed, args.ops, *gen_args), config, args.validate_every, args.timeout)
+        elapsed = time.perf_counter() - t0
+        if div is None:
+            print(f"semente {seed}: {args.ops:,} operações ok ({args.ops / elapsed:,.0f} ops/s)")
+            continue
+        print(f"semente {seed}: divergência na operação {div.index:,} ({div.op[0]}): "
+              f"esperado {div.expected!r}, obtido {div.got!r}")
+        ops = list(islice(generate(seed, args.ops, *gen_args), div.index + 1))
+        small = minimize(ops, config, div, timeout=args.timeout)
+        final = run(small, config, 1, args.timeout)
+        script = reproducer(small, config, final or div)
+        print(f"reprodução mínima ({len(small)} operações):\n")
+        print(script)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(script)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()